@@ -0,0 +1,36 @@
+"""GiST index for booking overlap checks
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 10:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    # IF NOT EXISTS: индекс мог быть уже создан через create_all.
+    # CONCURRENTLY не блокирует запись в bookings, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.execute(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bookings_resource_period
+            ON bookings USING gist (resource_id, tstzrange(start_time, end_time))
+            WHERE status IN ('pending', 'confirmed')
+            """
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_bookings_resource_period")
@@ -0,0 +1,28 @@
+"""Exclusion constraint against overlapping active bookings
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 10:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Ограничение заменено проверкой вместимости под блокировкой ресурса
+    # (0004): в базе с пересекающимися бронями ALTER TABLE упал бы на
+    # exclusion_violation. Ревизия оставлена, чтобы не менять цепочку.
+    pass
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,36 @@
+"""Allow overlapping bookings up to resource capacity
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 10:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Базы, где применялась прежняя 0003, содержат ограничение вместо
+    # GiST-индекса; оно несовместимо с capacity > 1
+    op.execute("ALTER TABLE bookings DROP CONSTRAINT IF EXISTS excl_bookings_resource_period")
+    with op.get_context().autocommit_block():
+        op.execute(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bookings_resource_period
+            ON bookings USING gist (resource_id, tstzrange(start_time, end_time))
+            WHERE status IN ('pending', 'confirmed')
+            """
+        )
+
+
+def downgrade() -> None:
+    # Индекс принадлежит 0002, ограничение больше не создается
+    pass
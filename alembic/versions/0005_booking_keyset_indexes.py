@@ -0,0 +1,32 @@
+"""Indexes for keyset pagination of booking lists
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в bookings, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bookings_start_id ON bookings (start_time, id)")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bookings_user_start_id ON bookings (user_id, start_time, id)")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bookings_resource_start_id ON bookings (resource_id, start_time, id)")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_bookings_resource_start_id")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_bookings_user_start_id")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_bookings_start_id")
@@ -0,0 +1,35 @@
+"""Transactional outbox for Celery dispatch
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS outbox_messages (
+            id BIGSERIAL PRIMARY KEY,
+            task_name VARCHAR NOT NULL,
+            payload JSONB NOT NULL,
+            idempotency_key VARCHAR NOT NULL UNIQUE,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS outbox_messages")
@@ -1,15 +1,56 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
+from .metrics import instrument_engine
 
-engine = create_engine(settings.database_url)
+# Общие настройки пула: pre-ping отбрасывает соединения, разорванные
+# переключением базы, recycle ограничивает их возраст
+POOL_OPTIONS = dict(
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping
+)
+
+# Синхронный движок — для Celery-задач и Alembic
+engine = create_engine(
+    settings.database_url,
+    connect_args={"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"},
+    **POOL_OPTIONS
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine, "sync")
+
+# Асинхронный движок (asyncpg) — для эндпоинтов FastAPI
+async_engine = create_async_engine(
+    settings.async_database_url,
+    connect_args={"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}},
+    **POOL_OPTIONS
+)
+instrument_engine(async_engine.sync_engine, "async")
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+def pool_status(pool) -> dict:
+    """Заполненность пула соединений движка"""
+    limit = pool.size() + settings.db_max_overflow
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "limit": limit,
+        "saturated": pool.checkedout() >= limit
+    }
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+from .config import settings
+from .redis_client import get_redis, get_sync_redis
+
+logger = logging.getLogger(__name__)
+
+# Канал Redis, через который воркеры сообщают друг другу об изменениях.
+# Сообщение — префикс ключей, которые нужно удалить из локального кеша.
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+_MISSING = object()
+
+class SingleFlight:
+    """Объединяет одновременные вызовы загрузчика с одинаковым ключом.
+
+    Первый вызов выполняет загрузчик, остальные ждут его результата
+    (или исключения) вместо повторного запроса к Redis/Postgres.
+    """
+    
+    def __init__(self):
+        self._inflight = {}
+    
+    async def do(self, key, loader: Callable[[], Awaitable[Any]]):
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Отменили загружавший запрос, а не нас — загружаем сами
+                if inflight.cancelled():
+                    return await self.do(key, loader)
+                raise
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # помечаем как полученное, если ожидающих нет
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+class LocalCache:
+    """Ограниченный LRU/TTL-кеш в памяти процесса (L1 перед Redis и Postgres).
+
+    Ограничен и числом записей, и суммарным размером значений. Одновременные
+    промахи по одному ключу объединяются (single-flight): загрузчик
+    выполняется один раз, остальные запросы ждут его результата.
+    """
+    
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._flights = SingleFlight()
+    
+    def get(self, key: str, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        value, size, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return default
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any, size: Optional[int] = None, ttl: Optional[float] = None):
+        if size is None:
+            size = len(value) if isinstance(value, (str, bytes)) else sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (value, size, time.monotonic() + (ttl or self.ttl))
+        self.size_bytes += size
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+    
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], size: Optional[Callable[[Any], int]] = None):
+        """Возвращает значение из кеша или загружает его один раз на все ожидающие запросы"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        
+        async def load_and_store():
+            value = await loader()
+            self.set(key, value, size(value) if size else None)
+            return value
+        
+        return await self._flights.do(key, load_and_store)
+    
+    def invalidate(self, prefix: str):
+        """Удаляет все записи, ключ которых начинается с prefix"""
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self._remove(key)
+    
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+    
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
+
+local_cache = LocalCache(
+    max_entries=settings.local_cache_max_entries,
+    max_bytes=settings.local_cache_max_bytes,
+    ttl=settings.local_cache_ttl
+)
+
+async def publish_invalidation(*prefixes: str):
+    """Сбрасывает префиксы в локальном кеше этого и всех остальных воркеров"""
+    for prefix in prefixes:
+        local_cache.invalidate(prefix)
+    redis = await get_redis()
+    async with redis.pipeline(transaction=False) as pipe:
+        for prefix in prefixes:
+            pipe.publish(INVALIDATION_CHANNEL, prefix)
+        await pipe.execute()
+
+def publish_invalidation_sync(*prefixes: str):
+    """То же для синхронного кода (Celery-задачи)"""
+    pipe = get_sync_redis().pipeline(transaction=False)
+    for prefix in prefixes:
+        pipe.publish(INVALIDATION_CHANNEL, prefix)
+    pipe.execute()
+
+async def listen_for_invalidations():
+    """Фоновая задача воркера API: применяет сообщения об инвалидации из Redis"""
+    redis = await get_redis()
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Пока подписки не было, сообщения могли быть пропущены
+            local_cache.clear()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    local_cache.invalidate(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Cache invalidation listener disconnected: %s", e)
+            local_cache.clear()
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.close()
@@ -0,0 +1,189 @@
+import os
+import time
+from datetime import datetime
+from contextvars import ContextVar
+from typing import Optional
+from prometheus_client import CollectorRegistry, Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest, start_http_server
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Метрики Prometheus процесса. При нескольких процессах (uvicorn --workers,
+# prefork-воркеры Celery) задайте PROMETHEUS_MULTIPROC_DIR: значения пишутся
+# в файлы и суммируются при выдаче /metrics.
+#
+# Инструментирование рассчитано на единицы микросекунд на запрос: чистый
+# ASGI middleware без BaseHTTPMiddleware, заранее связанные метки и
+# perf_counter вместо datetime.
+
+# Корзины гистограмм, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request",
+    ["route"], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in SQL per HTTP request",
+    ["route"], buckets=LATENCY_BUCKETS
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL statement duration outside HTTP requests",
+    ["engine"], buckets=QUERY_BUCKETS
+)
+CALENDAR_CACHE_LOOKUPS = Counter(
+    "calendar_cache_lookups_total", "Calendar day bucket lookups", ["result"]
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "bcrypt time including pool queueing",
+    ["operation"], buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds", "Celery task runtime", ["task", "state"], buckets=TASK_BUCKETS
+)
+CELERY_TASK_LAG = Histogram(
+    "celery_task_queue_lag_seconds", "Time from publish (or ETA) to task start", ["task"], buckets=TASK_BUCKETS
+)
+
+# Счетчики SQL текущего HTTP-запроса: [число запросов, секунды]
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+
+def registry() -> CollectorRegistry:
+    """Реестр для выдачи: в многопроцессном режиме собирает файлы всех процессов"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        collector_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector_registry)
+        return collector_registry
+    from prometheus_client import REGISTRY
+    return REGISTRY
+
+def render_metrics():
+    """Тело и Content-Type ответа /metrics"""
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
+
+def instrument_engine(engine: Engine, name: str):
+    """Считает время SQL-запросов движка.
+
+    Внутри HTTP-запроса время только складывается в счетчики запроса, а в
+    гистограммы попадает один раз — в MetricsMiddleware: наблюдение
+    гистограммы на каждый запрос к базе дороже самого подсчета. Вне HTTP
+    (Celery, прогрев) каждый запрос наблюдается в db_query_duration_seconds.
+    """
+    duration = DB_QUERY_DURATION.labels(engine=name)
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        totals = _request_db.get()
+        if totals is None:
+            duration.observe(elapsed)
+        else:
+            totals[0] += 1
+            totals[1] += elapsed
+
+def instrument_celery(port: int):
+    """Длительность и задержка в очереди Celery-задач; метрики воркера отдаются на port"""
+    from celery.signals import before_task_publish, task_prerun, task_postrun, worker_ready
+    started = {}
+    
+    @before_task_publish.connect(weak=False)
+    def _stamp_publish_time(headers=None, **kwargs):
+        if headers is not None:
+            headers.setdefault("published_at", time.time())
+    
+    @task_prerun.connect(weak=False)
+    def _task_started(task_id=None, task=None, **kwargs):
+        started[task_id] = time.perf_counter()
+        request = task.request
+        # Для задач с ETA/countdown отставание считается от назначенного времени
+        eta = request.eta
+        if isinstance(eta, str):
+            eta = datetime.fromisoformat(eta)
+        due = eta.timestamp() if eta else getattr(request, "published_at", None)
+        if due:
+            CELERY_TASK_LAG.labels(task.name).observe(max(time.time() - due, 0.0))
+    
+    @task_postrun.connect(weak=False)
+    def _task_finished(task_id=None, task=None, state=None, **kwargs):
+        began = started.pop(task_id, None)
+        if began is not None:
+            CELERY_TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - began)
+    
+    @worker_ready.connect(weak=False)
+    def _serve_metrics(**kwargs):
+        if port:
+            start_http_server(port, registry=registry())
+
+class MetricsMiddleware:
+    """ASGI middleware: латентность по шаблону маршрута и SQL на запрос.
+
+    Метка route — шаблон пути (/bookings/{booking_id}), а не сам путь, чтобы
+    число рядов не росло с числом id.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+        self._cache = {}
+    
+    def _route_path(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._routes is None:
+            self._routes = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint")
+            }
+        return self._routes.get(endpoint, "unmatched")
+    
+    def _series(self, scope, status_code: int):
+        """Ряды гистограмм запроса; кешируются, чтобы не искать метки на каждом запросе"""
+        key = (scope["method"], scope.get("endpoint"), status_code)
+        series = self._cache.get(key)
+        if series is None:
+            route = self._route_path(scope)
+            series = (
+                HTTP_REQUEST_DURATION.labels(scope["method"], route, status_code),
+                HTTP_REQUEST_DB_QUERIES.labels(route),
+                HTTP_REQUEST_DB_SECONDS.labels(route)
+            )
+            self._cache[key] = series
+        return series
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        totals = [0, 0.0]
+        token = _request_db.set(totals)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db.reset(token)
+            duration, queries, db_seconds = self._series(scope, status_code)
+            duration.observe(elapsed)
+            queries.observe(totals[0])
+            db_seconds.observe(totals[1])
@@ -1,7 +1,57 @@
+import redis as sync_redis
 import redis.asyncio as redis
 from .config import settings
 
-redis_client = redis.from_url(settings.redis_url, decode_responses=True)
+def _pool(pool_class, decode_responses: bool):
+    # При исчерпании пула запрос ждет свободное соединение до redis_pool_timeout,
+    # а не получает ошибку "Too many connections"
+    return pool_class.from_url(
+        settings.redis_url,
+        decode_responses=decode_responses,
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_timeout,
+        health_check_interval=settings.redis_health_check_interval
+    )
+
+redis_client = redis.Redis(connection_pool=_pool(redis.BlockingConnectionPool, True))
+
+# Клиент без декодирования: готовые JSON-ответы отдаются байтами как есть
+redis_bytes_client = redis.Redis(connection_pool=_pool(redis.BlockingConnectionPool, False))
+
+# Синхронный клиент для Celery-задач. Пул redis-py проверяет pid и после
+# fork воркера сам открывает новые соединения.
+sync_redis_client = sync_redis.Redis(connection_pool=_pool(sync_redis.BlockingConnectionPool, True))
 
 async def get_redis():
     return redis_client
+
+async def get_redis_bytes():
+    return redis_bytes_client
+
+def get_sync_redis():
+    return sync_redis_client
+
+def _idle_connections(pool) -> int:
+    # Очередь BlockingConnectionPool заполнена заглушками None; свободные
+    # соединения — непустые элементы. У queue.LifoQueue список лежит в
+    # .queue, у asyncio.LifoQueue — в ._queue
+    queue = getattr(pool.pool, "queue", None)
+    if queue is None:
+        queue = pool.pool._queue
+    return sum(1 for connection in list(queue) if connection is not None)
+
+def redis_pool_status(client) -> dict:
+    """Заполненность пула соединений Redis"""
+    pool = client.connection_pool
+    if hasattr(pool, "_in_use_connections"):
+        in_use = len(pool._in_use_connections)
+    else:
+        # BlockingConnectionPool учитывает только созданные соединения
+        in_use = len(pool._connections) - _idle_connections(pool)
+    return {
+        "in_use": in_use,
+        "limit": pool.max_connections,
+        "saturated": in_use >= pool.max_connections
+    }
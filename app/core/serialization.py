@@ -0,0 +1,18 @@
+import orjson
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+
+# OPT_UTC_Z пишет UTC как "Z" — так же, как Pydantic, поэтому ответы
+# быстрого пути совпадают с ответами через response_model
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+def loads(payload):
+    return orjson.loads(payload)
+
+class ORJSONResponse(_ORJSONResponse):
+    """Ответ по умолчанию: сериализация orjson вместо json.dumps"""
+    
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,37 @@
+import asyncio
+import logging
+from sqlalchemy import text
+from .config import settings
+from .database import async_engine
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+async def _warm_postgres():
+    """Открывает db_warmup_connections соединений, чтобы первые запросы не ждали TCP и авторизацию"""
+    async def connect():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    
+    # Соединения открываются одновременно и после выхода остаются в пуле
+    connections = min(settings.db_warmup_connections, settings.db_pool_size)
+    await asyncio.gather(*(connect() for _ in range(connections)))
+
+async def _warm_redis():
+    redis = await get_redis()
+    await redis.ping()
+
+async def warm_up():
+    """Параллельно прогревает пулы Postgres и Redis.
+
+    Ошибки не мешают запуску: приложение стартует, а недоступную
+    зависимость покажет /health/ready.
+    """
+    results = await asyncio.gather(
+        asyncio.wait_for(_warm_postgres(), timeout=settings.health_check_timeout),
+        asyncio.wait_for(_warm_redis(), timeout=settings.health_check_timeout),
+        return_exceptions=True
+    )
+    for name, result in zip(("postgres", "redis"), results):
+        if isinstance(result, BaseException):
+            logger.warning("Warm-up of %s failed: %r", name, result)
@@ -1,8 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text
+from datetime import datetime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, ForeignKey, Text, Index, DDL, event
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
 
+# Статусы, при которых бронь занимает слот ресурса
+ACTIVE_BOOKING_STATUSES = ("pending", "confirmed")
+
 class User(Base):
     __tablename__ = "users"
     
@@ -39,6 +44,65 @@ class Booking(Base):
     notes = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Когда напоминание взято в рассылку; NULL — еще не отправлялось
+    reminder_sent_at = Column(DateTime(timezone=True))
     
     user = relationship("User", back_populates="bookings")
     resource = relationship("Resource", back_populates="bookings")
+    
+    __table_args__ = (
+        # Keyset-пагинация по (start_time, id) для списков броней
+        Index("ix_bookings_start_id", start_time, id),
+        Index("ix_bookings_user_start_id", user_id, start_time, id),
+        Index("ix_bookings_resource_start_id", resource_id, start_time, id),
+        # Поиск просроченных pending-броней задачей очистки
+        Index("ix_bookings_pending_created", created_at, postgresql_where=status == "pending"),
+        # Брони, ожидающие напоминания, в порядке обхода рассылки
+        Index(
+            "ix_bookings_reminder_due",
+            start_time,
+            id,
+            postgresql_where=(status == "confirmed") & reminder_sent_at.is_(None)
+        ),
+        # GiST-индекс по полуоткрытому интервалу [start_time, end_time) активных броней.
+        # Вместимость ресурса может быть больше 1, поэтому пересечения допустимы —
+        # лимит проверяет BookingService под блокировкой строки ресурса.
+        Index(
+            "ix_bookings_resource_period",
+            resource_id,
+            func.tstzrange(start_time, end_time),
+            postgresql_using="gist",
+            postgresql_where=status.in_(ACTIVE_BOOKING_STATUSES)
+        ),
+    )
+
+def overlaps(start_time: datetime, end_time: datetime):
+    """Условие пересечения брони с полуоткрытым интервалом [start_time, end_time).
+
+    Совпадает с выражением GiST-индекса ix_bookings_resource_period,
+    поэтому проверка идет по индексу, а не последовательным сканированием.
+    """
+    return func.tstzrange(Booking.start_time, Booking.end_time).op("&&")(
+        func.tstzrange(start_time, end_time)
+    )
+
+class OutboxMessage(Base):
+    """Задача для брокера, записанная в одной транзакции с изменением данных.
+
+    Публикует ее задача relay_outbox; idempotency_key передается в задачу,
+    чтобы повторная публикация после сбоя не выполнялась дважды.
+    """
+    __tablename__ = "outbox_messages"
+    
+    id = Column(BigInteger, primary_key=True)
+    task_name = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    idempotency_key = Column(String, unique=True, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# btree_gist нужен для integer-колонки в GiST-индексе
+event.listen(
+    Booking.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(dialect="postgresql")
+)
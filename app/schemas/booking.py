@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
 
 # User schemas
 class UserBase(BaseModel):
@@ -57,9 +57,45 @@ class BookingResponse(BookingBase):
     class Config:
         from_attributes = True
 
+class BulkBookingCreate(BaseModel):
+    bookings: List[BookingCreate] = Field(..., min_length=1, max_length=500)
+    # True — при любом конфликте не создается ни одна бронь
+    all_or_nothing: bool = True
+
+class RecurringBookingCreate(BookingBase):
+    """Серия броней по правилу повторения в духе RRULE (RFC 5545)"""
+    frequency: Literal["daily", "weekly", "monthly"]
+    interval: int = Field(1, ge=1)
+    # Ограничение серии: число вхождений и/или дата окончания
+    count: Optional[int] = Field(None, ge=1)
+    until: Optional[datetime] = None
+    # Дни недели для weekly: 0 — понедельник ... 6 — воскресенье
+    by_weekday: Optional[List[int]] = None
+    all_or_nothing: bool = True
+
+class BookingRejection(BaseModel):
+    index: int
+    resource_id: int
+    start_time: datetime
+    end_time: datetime
+    reason: str
+
+class BulkBookingResponse(BaseModel):
+    created: List[BookingResponse]
+    rejected: List[BookingRejection] = []
+
 class BookingList(BaseModel):
     bookings: List[BookingResponse]
-    total: int
+    # Курсор следующей страницы; None — страниц больше нет
+    next_cursor: Optional[str] = None
+
+# Availability schemas
+class AvailableSlot(BaseModel):
+    resource_id: int
+    resource_name: str
+    capacity: int
+    start_time: datetime
+    end_time: datetime
 
 # Auth schemas
 class Token(BaseModel):
@@ -68,3 +104,46 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+
+class CurrentUser(BaseModel):
+    """Пользователь из JWT без обращения к базе"""
+    id: int
+    username: str
+    is_active: bool = True
+
+# Быстрый путь сериализации больших списков: словари строятся напрямую из
+# ORM-объектов без валидации Pydantic. Поля должны совпадать с
+# UserResponse, ResourceResponse и BookingResponse.
+def user_to_dict(user) -> dict:
+    return {
+        "email": user.email,
+        "username": user.username,
+        "id": user.id,
+        "is_active": user.is_active,
+        "created_at": user.created_at
+    }
+
+def resource_to_dict(resource) -> dict:
+    return {
+        "name": resource.name,
+        "description": resource.description,
+        "capacity": resource.capacity,
+        "id": resource.id,
+        "is_active": resource.is_active,
+        "created_at": resource.created_at
+    }
+
+def booking_to_dict(booking) -> dict:
+    return {
+        "resource_id": booking.resource_id,
+        "start_time": booking.start_time,
+        "end_time": booking.end_time,
+        "notes": booking.notes,
+        "id": booking.id,
+        "user_id": booking.user_id,
+        "status": booking.status,
+        "created_at": booking.created_at,
+        "updated_at": booking.updated_at,
+        "user": user_to_dict(booking.user),
+        "resource": resource_to_dict(booking.resource)
+    }
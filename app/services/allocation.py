@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+def _sweep_events(intervals: Iterable[Tuple[datetime, datetime]], start_time: datetime, end_time: datetime) -> List[Tuple[datetime, int]]:
+    """События начала (+1) и окончания (-1) броней, обрезанных по [start_time, end_time)"""
+    events = []
+    for booking_start, booking_end in intervals:
+        booking_start = max(booking_start, start_time)
+        booking_end = min(booking_end, end_time)
+        if booking_start < booking_end:
+            events.append((booking_start, 1))
+            events.append((booking_end, -1))
+    
+    # -1 < 1: окончания раньше начал в один и тот же момент
+    events.sort()
+    return events
+
+def peak_occupancy(intervals: Iterable[Tuple[datetime, datetime]], start_time: datetime, end_time: datetime) -> int:
+    """Максимальное число одновременных броней внутри [start_time, end_time).
+
+    Sweep-line по событиям начала/окончания: O(k log k) для k пересекающихся броней.
+    Интервалы полуоткрытые, поэтому при равном времени окончание обрабатывается
+    раньше начала — бронь, заканчивающаяся в 10:00, не мешает брони с 10:00.
+    """
+    current = peak = 0
+    for _, delta in _sweep_events(intervals, start_time, end_time):
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+def free_gaps(intervals: Iterable[Tuple[datetime, datetime]], start_time: datetime, end_time: datetime, capacity: int = 1) -> List[Tuple[datetime, datetime]]:
+    """Промежутки внутри [start_time, end_time), где занято меньше capacity мест.
+
+    Тот же sweep-line, что и в peak_occupancy: соседние промежутки сливаются,
+    поэтому результат — непересекающиеся интервалы в порядке возрастания.
+    """
+    gaps = []
+    current = 0
+    gap_start = start_time
+    for moment, delta in _sweep_events(intervals, start_time, end_time):
+        was_free = current < capacity
+        current += delta
+        if was_free and current >= capacity:
+            if gap_start < moment:
+                gaps.append((gap_start, moment))
+        elif not was_free and current < capacity:
+            gap_start = moment
+    
+    if current < capacity and gap_start < end_time:
+        gaps.append((gap_start, end_time))
+    return gaps
@@ -1,22 +1,35 @@
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from typing import Optional
 from ..core.config import settings
 from ..core.database import get_db
+from ..core.local_cache import local_cache, publish_invalidation
+from ..core.redis_client import get_redis
 from ..models.booking import User
+from ..schemas.booking import CurrentUser
+from .password_hashing import get_context, password_hasher
+
+# Множество id пользователей, чьи токены больше не принимаются
+REVOKED_USERS_KEY = "auth:revoked_users"
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_context().hash(password)
+
+def create_user_token(user: User, expires_delta: Optional[timedelta] = None):
+    """Токен с id и флагом активности, чтобы не искать пользователя в базе на каждый запрос"""
+    return create_access_token(
+        data={"sub": user.username, "uid": user.id, "act": bool(user.is_active)},
+        expires_delta=expires_delta
+    )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -27,16 +40,48 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
 
-def get_user_by_username(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+async def get_user_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user_by_username(db, username)
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user_by_username(db, username)
+    if not user:
         return False
+    
+    is_valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not is_valid:
+        return False
+    if new_hash:
+        # Стоимость bcrypt изменилась — прозрачно перехешируем пароль
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def revocation_cache_key(user_id: int) -> str:
+    return f"auth:revoked:{user_id}"
+
+async def is_revoked(user_id: int) -> bool:
+    """Проверяет отзыв пользователя: локальный кеш с коротким TTL, затем Redis"""
+    key = revocation_cache_key(user_id)
+    revoked = local_cache.get(key)
+    if revoked is None:
+        redis = await get_redis()
+        revoked = bool(await redis.sismember(REVOKED_USERS_KEY, user_id))
+        local_cache.set(key, revoked, size=1, ttl=settings.auth_revocation_cache_ttl)
+    return revoked
+
+async def revoke_user(user_id: int):
+    """Отзывает все токены пользователя на всех воркерах.
+
+    Вызывается кодом, который деактивирует пользователя: выданные токены
+    содержат act=true и без отзыва остаются действительными до истечения.
+    """
+    redis = await get_redis()
+    await redis.sadd(REVOKED_USERS_KEY, user_id)
+    await publish_invalidation(revocation_cache_key(user_id))
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -50,7 +95,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = get_user_by_username(db, username=username)
-    if user is None:
+    user_id = payload.get("uid")
+    if user_id is None:
+        # Токены, выданные до появления uid в payload
+        user = await get_user_by_username(db, username=username)
+        if user is None:
+            raise credentials_exception
+        user_id, is_active = user.id, bool(user.is_active)
+    else:
+        is_active = payload.get("act", True)
+    
+    if not is_active or await is_revoked(user_id):
         raise credentials_exception
-    return user
+    return CurrentUser(id=user_id, username=username, is_active=is_active)
@@ -1,53 +1,312 @@
-from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from datetime import date, datetime, time, timedelta, timezone
+from collections import defaultdict
+from itertools import groupby
+from typing import List, Optional
+from time import perf_counter
+import base64
+import csv
+import io
+import heapq
+import json
+from sqlalchemy import select, insert, values, column, and_, func, tuple_, Integer, DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from fastapi import HTTPException, status
-from ..models.booking import Booking, Resource, User
+from fastapi.encoders import jsonable_encoder
+from ..models.booking import Booking, Resource, User, ACTIVE_BOOKING_STATUSES, overlaps
 from ..schemas.booking import BookingCreate
-from ..core.redis_client import get_redis
-import json
+from ..core.local_cache import SingleFlight, local_cache
+from ..core.redis_client import get_redis, get_redis_bytes
+from ..core.serialization import dumps
+from .calendar_cache import CALENDAR_TTL, calendar_stats, day_key, range_key, dump_bucket, load_bucket, dump_range, load_range, get_generation, invalidate_calendar
+from .allocation import peak_occupancy, free_gaps
+from .booking_stats import record_status_change
+from .outbox import add_outbox_messages, booking_created_messages
+
+# Загрузки календаря из базы, объединяемые при одновременных промахах
+_calendar_flights = SingleFlight()
+
+# Наибольший диапазон календаря, дней: каждый день — отдельный ключ кеша
+MAX_CALENDAR_DAYS = 366
+
+def with_relations(query):
+    """Загружает user и resource в том же запросе (JOIN), что нужно для BookingResponse.
+
+    Ленивые загрузки на AsyncSession недоступны, а selectin добавил бы по запросу
+    на каждую связь; many-to-one через JOIN дает ровно один SQL-запрос на список.
+    """
+    return query.options(joinedload(Booking.user), joinedload(Booking.resource))
+
+def encode_cursor(start_time: datetime, booking_id: int) -> str:
+    """Непрозрачный курсор страницы: позиция последней выданной брони"""
+    raw = json.dumps([start_time.isoformat(), booking_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        start_time, booking_id = json.loads(raw)
+        return datetime.fromisoformat(start_time), int(booking_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Размер порции серверного курсора при выгрузке
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = (
+    "id", "user_id", "user_email", "resource_id", "resource_name",
+    "start_time", "end_time", "status", "notes", "created_at", "updated_at"
+)
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _csv_chunk(records) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(records)
+    return buffer.getvalue().encode()
+
+def as_utc(moment: datetime) -> datetime:
+    """Приводит время к UTC; время без часового пояса считается UTC"""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+def calendar_days(start_date: datetime, end_date: datetime) -> int:
+    """Число дней диапазона календаря (0, если конец раньше начала); 400 для слишком длинного"""
+    days = max((as_utc(end_date).date() - as_utc(start_date).date()).days + 1, 0)
+    if days > MAX_CALENDAR_DAYS:
+        raise HTTPException(status_code=400, detail=f"Calendar range cannot exceed {MAX_CALENDAR_DAYS} days")
+    return days
+
+def ensure_valid_period(start_time: datetime, end_time: datetime):
+    """400 для пустого или перевернутого интервала: tstzrange не принимает end < start"""
+    if as_utc(end_time) <= as_utc(start_time):
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+
+def slot_taken():
+    """Ответ 409 для уже занятого временного слота"""
+    return HTTPException(
+        status_code=409,
+        detail="Resource is not available for the requested time slot"
+    )
 
 class BookingService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    async def check_availability(self, resource_id: int, start_time: datetime, end_time: datetime, exclude_booking_id: int = None):
-        """Проверяет доступность ресурса на указанное время"""
-        query = self.db.query(Booking).filter(
+    def _conflicts_query(self, columns, resource_id: int, start_time: datetime, end_time: datetime, exclude_booking_id: int = None):
+        query = select(*columns).where(
+            Booking.resource_id == resource_id,
+            Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+            overlaps(start_time, end_time)
+        )
+        if exclude_booking_id:
+            query = query.where(Booking.id != exclude_booking_id)
+        return query
+    
+    async def get_peak_occupancy(self, resource_id: int, start_time: datetime, end_time: datetime, exclude_booking_id: int = None):
+        """Пиковое число одновременных активных броней ресурса на интервале"""
+        # Загружаем только границы интервалов, без ORM-объектов
+        result = await self.db.execute(
+            self._conflicts_query(
+                (Booking.start_time, Booking.end_time),
+                resource_id, start_time, end_time, exclude_booking_id
+            )
+        )
+        # asyncpg возвращает время с часовым поясом, границы запроса приводим к UTC
+        return peak_occupancy(result.all(), as_utc(start_time), as_utc(end_time))
+    
+    async def check_availability(self, resource_id: int, start_time: datetime, end_time: datetime, exclude_booking_id: int = None, capacity: int = None):
+        """Проверяет доступность ресурса на указанное время с учетом вместимости"""
+        ensure_valid_period(start_time, end_time)
+        if capacity is None:
+            capacity = await self.db.scalar(select(Resource.capacity).where(Resource.id == resource_id))
+        capacity = capacity or 1
+        
+        if capacity == 1:
+            # EXISTS останавливается на первом найденном конфликте
+            conflicts = self._conflicts_query((Booking.id,), resource_id, start_time, end_time, exclude_booking_id)
+            has_conflicts = await self.db.scalar(select(conflicts.exists()))
+            return not has_conflicts
+        
+        peak = await self.get_peak_occupancy(resource_id, start_time, end_time, exclude_booking_id)
+        return peak < capacity
+    
+    async def search_free_slots(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        duration: timedelta,
+        min_capacity: int = 1,
+        resource_ids: Optional[List[int]] = None,
+        limit: int = 10
+    ):
+        """Ищет первые свободные слоты заданной длительности среди всех активных ресурсов.
+
+        Ресурсы и их брони в окне загружаются одним запросом (LEFT JOIN по
+        GiST-индексу), промежутки считаются в памяти без запросов на каждый ресурс.
+        """
+        start_time, end_time = as_utc(start_time), as_utc(end_time)
+        query = select(
+            Resource.id, Resource.name, Resource.capacity, Booking.start_time, Booking.end_time
+        ).outerjoin(
+            Booking,
             and_(
-                Booking.resource_id == resource_id,
-                Booking.status.in_(["pending", "confirmed"]),
-                or_(
-                    and_(Booking.start_time <= start_time, Booking.end_time > start_time),
-                    and_(Booking.start_time < end_time, Booking.end_time >= end_time),
-                    and_(Booking.start_time >= start_time, Booking.end_time <= end_time)
-                )
+                Booking.resource_id == Resource.id,
+                Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+                overlaps(start_time, end_time)
             )
+        ).where(
+            Resource.is_active == True,
+            func.coalesce(Resource.capacity, 1) >= min_capacity
+        ).order_by(Resource.id)
+        
+        if resource_ids:
+            query = query.where(Resource.id.in_(resource_ids))
+        
+        result = await self.db.execute(query)
+        
+        candidates = []
+        for (resource_id, name, capacity), rows in groupby(result.all(), key=lambda row: row[:3]):
+            intervals = [(row.start_time, row.end_time) for row in rows if row.start_time is not None]
+            for gap_start, gap_end in free_gaps(intervals, start_time, end_time, capacity or 1):
+                if gap_end - gap_start >= duration:
+                    candidates.append((gap_start, resource_id, name, capacity or 1))
+        
+        return [
+            {
+                "resource_id": resource_id,
+                "resource_name": name,
+                "capacity": capacity,
+                "start_time": slot_start,
+                "end_time": slot_start + duration
+            }
+            for slot_start, resource_id, name, capacity in heapq.nsmallest(limit, candidates)
+        ]
+    
+    async def get_booking(self, booking_id: int, user_id: int = None):
+        """Загружает бронирование вместе с пользователем и ресурсом"""
+        query = with_relations(select(Booking)).where(Booking.id == booking_id)
+        
+        if user_id is not None:
+            query = query.where(Booking.user_id == user_id)
+        
+        # populate_existing: бронь могла остаться в сессии после commit
+        result = await self.db.execute(query.execution_options(populate_existing=True))
+        return result.scalars().first()
+    
+    async def list_bookings(
+        self,
+        user_id: int = None,
+        status: str = None,
+        resource_id: int = None,
+        date_from: datetime = None,
+        date_to: datetime = None,
+        cursor: str = None,
+        limit: int = 50
+    ):
+        """Страница броней с keyset-пагинацией по (start_time, id).
+
+        Следующая страница начинается строго после последней строки предыдущей,
+        поэтому стоимость не зависит от глубины (в отличие от OFFSET). Фильтры
+        совпадают с префиксами индексов ix_bookings_*_start_id.
+        Возвращает (брони, курсор следующей страницы или None).
+        """
+        query = with_relations(select(Booking))
+        if user_id is not None:
+            query = query.where(Booking.user_id == user_id)
+        if status is not None:
+            query = query.where(Booking.status == status)
+        if resource_id is not None:
+            query = query.where(Booking.resource_id == resource_id)
+        if date_from is not None:
+            query = query.where(Booking.start_time >= date_from)
+        if date_to is not None:
+            query = query.where(Booking.start_time < date_to)
+        if cursor:
+            after_start, after_id = decode_cursor(cursor)
+            query = query.where(tuple_(Booking.start_time, Booking.id) > tuple_(after_start, after_id))
+        
+        # Лишняя строка показывает, есть ли следующая страница
+        result = await self.db.execute(
+            query.order_by(Booking.start_time, Booking.id).limit(limit + 1)
         )
+        bookings = result.scalars().all()
         
-        if exclude_booking_id:
-            query = query.filter(Booking.id != exclude_booking_id)
+        next_cursor = None
+        if len(bookings) > limit:
+            bookings = bookings[:limit]
+            next_cursor = encode_cursor(bookings[-1].start_time, bookings[-1].id)
+        return bookings, next_cursor
+    
+    async def export_bookings(
+        self,
+        fmt: str = "ndjson",
+        status: str = None,
+        resource_id: int = None,
+        date_from: datetime = None,
+        date_to: datetime = None
+    ):
+        """Потоковая выгрузка броней в NDJSON или CSV.
+
+        Строки читаются серверным курсором порциями по EXPORT_CHUNK_SIZE и
+        сразу сериализуются, поэтому память не зависит от размера таблицы.
+        Выдает готовые к отправке куски bytes.
+        """
+        query = select(
+            Booking.id, Booking.user_id, User.email.label("user_email"),
+            Booking.resource_id, Resource.name.label("resource_name"),
+            Booking.start_time, Booking.end_time, Booking.status, Booking.notes,
+            Booking.created_at, Booking.updated_at
+        ).join(User, Booking.user_id == User.id).join(Resource, Booking.resource_id == Resource.id)
+        
+        if status is not None:
+            query = query.where(Booking.status == status)
+        if resource_id is not None:
+            query = query.where(Booking.resource_id == resource_id)
+        if date_from is not None:
+            query = query.where(Booking.start_time >= date_from)
+        if date_to is not None:
+            query = query.where(Booking.start_time < date_to)
         
-        conflicts = query.all()
-        return len(conflicts) == 0
+        result = await self.db.stream(
+            query.order_by(Booking.start_time, Booking.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        
+        if fmt == "csv":
+            yield _csv_chunk([EXPORT_COLUMNS])
+        async for rows in result.partitions():
+            records = [[_export_value(value) for value in row] for row in rows]
+            if fmt == "csv":
+                yield _csv_chunk(records)
+            else:
+                yield b"".join(dumps(dict(zip(EXPORT_COLUMNS, record))) + b"\n" for record in records)
     
     async def create_booking(self, user_id: int, booking_data: BookingCreate):
         """Создает новое бронирование"""
-        resource = self.db.query(Resource).filter(Resource.id == booking_data.resource_id).first()
+        ensure_valid_period(booking_data.start_time, booking_data.end_time)
+        
+        # Блокировка строки ресурса сериализует только брони этого ресурса:
+        # проверка занятости и вставка выполняются атомарно до commit.
+        # FOR NO KEY UPDATE не конфликтует с FK-проверками других таблиц.
+        resource = await self.db.scalar(
+            select(Resource)
+            .where(Resource.id == booking_data.resource_id)
+            .with_for_update(key_share=True)
+        )
         if not resource:
             raise HTTPException(status_code=404, detail="Resource not found")
         
         is_available = await self.check_availability(
             booking_data.resource_id,
             booking_data.start_time,
-            booking_data.end_time
+            booking_data.end_time,
+            capacity=resource.capacity
         )
         
         if not is_available:
-            raise HTTPException(
-                status_code=409,
-                detail="Resource is not available for the requested time slot"
-            )
+            raise slot_taken()
         
         # Создаем бронирование
         booking = Booking(
@@ -60,59 +319,288 @@ class BookingService:
         )
         
         self.db.add(booking)
-        self.db.commit()
-        self.db.refresh(booking)
+        await self.db.flush()
+        # Письмо и подтверждение публикуются релеем outbox после commit
+        await add_outbox_messages(self.db, booking_created_messages([booking.id]))
+        await self.db.commit()
         
         # Очищаем кеш календаря
         await self.clear_calendar_cache(booking_data.resource_id)
+        await record_status_change(None, "pending")
+        
+        return await self.get_booking(booking.id)
+    
+    async def create_bookings(self, user_id: int, items: List[BookingCreate], all_or_nothing: bool = True):
+        """Создает несколько броней одной транзакцией.
+
+        Все вхождения проверяются одним запросом (JOIN списка VALUES с бронями
+        по GiST-индексу) и между собой, затем вставляются одним многострочным
+        INSERT. При all_or_nothing любой конфликт отклоняет весь пакет (409),
+        иначе создаются только допустимые брони.
+        Возвращает (созданные брони, отклоненные вхождения).
+        """
+        if not items:
+            return [], []
+        
+        # Блокируем ресурсы в порядке id, чтобы пакеты не взаимоблокировались
+        resource_ids = sorted({item.resource_id for item in items})
+        result = await self.db.execute(
+            select(Resource.id, Resource.capacity)
+            .where(Resource.id.in_(resource_ids))
+            .order_by(Resource.id)
+            .with_for_update(key_share=True)
+        )
+        capacities = {resource_id: capacity or 1 for resource_id, capacity in result.all()}
+        
+        periods = [(as_utc(item.start_time), as_utc(item.end_time)) for item in items]
+        candidates = [
+            index for index, item in enumerate(items)
+            if item.resource_id in capacities and periods[index][0] < periods[index][1]
+        ]
+        existing = await self._existing_overlaps([(index, items[index].resource_id, *periods[index]) for index in candidates])
+        
+        accepted = []
+        accepted_periods = defaultdict(list)
+        rejected = []
+        for index, item in enumerate(items):
+            start_time, end_time = periods[index]
+            if item.resource_id not in capacities:
+                reason = "Resource not found"
+            elif start_time >= end_time:
+                reason = "end_time must be after start_time"
+            elif peak_occupancy(existing[index] + accepted_periods[item.resource_id], start_time, end_time) >= capacities[item.resource_id]:
+                reason = "Resource is not available for the requested time slot"
+            else:
+                accepted.append(item)
+                accepted_periods[item.resource_id].append((start_time, end_time))
+                continue
+            rejected.append({
+                "index": index,
+                "resource_id": item.resource_id,
+                "start_time": item.start_time,
+                "end_time": item.end_time,
+                "reason": reason
+            })
         
-        return booking
+        if rejected and all_or_nothing:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail=jsonable_encoder({"message": "Some bookings cannot be created", "rejected": rejected})
+            )
+        if not accepted:
+            await self.db.rollback()
+            return [], rejected
+        
+        result = await self.db.execute(
+            insert(Booking).values([
+                {
+                    "user_id": user_id,
+                    "resource_id": item.resource_id,
+                    "start_time": item.start_time,
+                    "end_time": item.end_time,
+                    "notes": item.notes,
+                    "status": "pending"
+                }
+                for item in accepted
+            ]).returning(Booking.id)
+        )
+        booking_ids = result.scalars().all()
+        await add_outbox_messages(self.db, booking_created_messages(booking_ids))
+        await self.db.commit()
+        
+        await invalidate_calendar(*accepted_periods)
+        await record_status_change(None, "pending", len(booking_ids))
+        
+        result = await self.db.execute(
+            with_relations(select(Booking))
+            .where(Booking.id.in_(booking_ids))
+            .order_by(Booking.start_time, Booking.id)
+        )
+        return result.scalars().all(), rejected
+    
+    async def _existing_overlaps(self, occurrences):
+        """Активные брони, пересекающие каждое вхождение (index, resource_id, start, end), одним запросом"""
+        overlapping = defaultdict(list)
+        if not occurrences:
+            return overlapping
+        
+        requested = values(
+            column("idx", Integer),
+            column("resource_id", Integer),
+            column("start_time", DateTime(timezone=True)),
+            column("end_time", DateTime(timezone=True)),
+            name="requested"
+        ).data(occurrences)
+        result = await self.db.execute(
+            select(requested.c.idx, Booking.start_time, Booking.end_time)
+            .select_from(requested)
+            .join(
+                Booking,
+                and_(
+                    Booking.resource_id == requested.c.resource_id,
+                    Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+                    overlaps(requested.c.start_time, requested.c.end_time)
+                )
+            )
+        )
+        for index, start_time, end_time in result.all():
+            overlapping[index].append((start_time, end_time))
+        return overlapping
     
     async def get_calendar(self, resource_id: int, start_date: datetime, end_date: datetime):
-        """Получает календарь занятости с кешированием"""
+        """Получает календарь занятости с кешированием по дням.
+
+        Каждый день ресурса кешируется отдельно, поэтому неделя, месяц и
+        произвольный диапазон используют одни и те же записи. Дни ищутся
+        сначала в локальном кеше воркера, затем одним MGET в Redis,
+        недостающие дочитываются из базы одним запросом.
+        """
         redis = await get_redis()
-        cache_key = f"calendar:{resource_id}:{start_date.date()}:{end_date.date()}"
+        range_start, range_end = as_utc(start_date), as_utc(end_date)
+        days = [range_start.date() + timedelta(days=i) for i in range(calendar_days(range_start, range_end))]
         
-        # Проверяем кеш
-        cached_data = await redis.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
+        generation = await get_generation(resource_id)
+        keys = {day: day_key(resource_id, generation, day) for day in days}
         
-        bookings = self.db.query(Booking).filter(
-            and_(
-                Booking.resource_id == resource_id,
-                Booking.status.in_(["pending", "confirmed"]),
-                Booking.start_time <= end_date,
-                Booking.end_time >= start_date
+        # L1: локальный кеш воркера
+        buckets = {}
+        for day in days:
+            items = local_cache.get(keys[day])
+            if items is not None:
+                buckets[day] = items
+        
+        # L2: Redis
+        remote = [day for day in days if day not in buckets]
+        missing = []
+        if remote:
+            cached = await redis.mget([keys[day] for day in remote])
+            for day, payload in zip(remote, cached):
+                if payload is None:
+                    missing.append(day)
+                    continue
+                items, refresh_early = load_bucket(payload)
+                if refresh_early:
+                    missing.append(day)
+                else:
+                    buckets[day] = items
+                    local_cache.set(keys[day], items, size=len(payload))
+        calendar_stats.record(hits=len(days) - len(missing), misses=len(missing))
+        
+        if missing:
+            # Одновременные промахи по тем же дням выполняют один запрос к базе
+            loaded = await _calendar_flights.do(
+                (resource_id, generation, tuple(missing)),
+                lambda: self._refresh_day_buckets(resource_id, missing, keys)
             )
-        ).all()
+            buckets.update(loaded)
         
-        calendar_data = {
+        # Многодневные брони лежат в нескольких корзинах
+        seen = set()
+        bookings = []
+        for day in days:
+            for item in buckets[day]:
+                if item["id"] in seen:
+                    continue
+                if datetime.fromisoformat(item["start_time"]) <= range_end and datetime.fromisoformat(item["end_time"]) >= range_start:
+                    seen.add(item["id"])
+                    bookings.append(item)
+        bookings.sort(key=lambda item: (item["start_time"], item["id"]))
+        
+        return {
             "resource_id": resource_id,
             "period": {
                 "start": start_date.isoformat(),
                 "end": end_date.isoformat()
             },
-            "bookings": [
-                {
-                    "id": booking.id,
-                    "start_time": booking.start_time.isoformat(),
-                    "end_time": booking.end_time.isoformat(),
-                    "status": booking.status,
-                    "user_id": booking.user_id
-                }
-                for booking in bookings
-            ]
+            "bookings": bookings
         }
+    
+    async def get_calendar_json(self, resource_id: int, start_date: datetime, end_date: datetime) -> bytes:
+        """Календарь как готовый JSON: ответ за диапазон кешируется целиком и отдается байтами"""
+        days = calendar_days(start_date, end_date)
+        generation = await get_generation(resource_id)
+        key = range_key(resource_id, generation, start_date, end_date)
+        body = local_cache.get(key)
+        if body is not None:
+            calendar_stats.record(hits=days)
+            return body
         
-        await redis.setex(cache_key, 300, json.dumps(calendar_data))
+        redis = await get_redis_bytes()
+        payload = await redis.get(key)
+        if payload is not None:
+            body, refresh_early = load_range(payload)
+            if not refresh_early:
+                calendar_stats.record(hits=days)
+                local_cache.set(key, body, size=len(body))
+                return body
         
-        return calendar_data
+        # Промахи и попадания по дням при пересборке считает get_calendar
+        return await _calendar_flights.do(
+            (resource_id, generation, "range", start_date, end_date),
+            lambda: self._refresh_range(resource_id, start_date, end_date, key)
+        )
+    
+    async def _refresh_range(self, resource_id: int, start_date: datetime, end_date: datetime, key: str) -> bytes:
+        """Собирает JSON диапазона из корзин дней и записывает его в Redis и локальный кеш"""
+        began = perf_counter()
+        body = dumps(await self.get_calendar(resource_id, start_date, end_date))
+        delta = perf_counter() - began
+        
+        redis = await get_redis_bytes()
+        await redis.setex(key, CALENDAR_TTL, dump_range(body, delta))
+        local_cache.set(key, body, size=len(body))
+        return body
+    
+    async def _refresh_day_buckets(self, resource_id: int, days: List[date], keys: dict):
+        """Загружает корзины дней из базы и записывает их в Redis и локальный кеш"""
+        began = perf_counter()
+        loaded = await self._load_day_buckets(resource_id, days)
+        delta = perf_counter() - began
+        
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            for day, items in loaded.items():
+                payload = dump_bucket(items, delta)
+                pipe.setex(keys[day], CALENDAR_TTL, payload)
+                local_cache.set(keys[day], items, size=len(payload))
+            await pipe.execute()
+        return loaded
+    
+    async def _load_day_buckets(self, resource_id: int, days: List[date]):
+        """Загружает брони для перечисленных дней одним запросом и раскладывает их по дням"""
+        first_day = datetime.combine(min(days), time.min, tzinfo=timezone.utc)
+        last_day_end = datetime.combine(max(days), time.min, tzinfo=timezone.utc) + timedelta(days=1)
+        
+        # Корзина дня содержит брони, касающиеся [00:00, 24:00] включительно;
+        # расширение на 1 мкс дает такую семантику через индексируемый tstzrange.
+        result = await self.db.execute(
+            select(Booking.id, Booking.start_time, Booking.end_time, Booking.status, Booking.user_id).where(
+                Booking.resource_id == resource_id,
+                Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+                overlaps(first_day - timedelta(microseconds=1), last_day_end + timedelta(microseconds=1))
+            )
+        )
+        
+        wanted = set(days)
+        buckets = {day: [] for day in days}
+        for row in result.all():
+            booking_start, booking_end = as_utc(row.start_time), as_utc(row.end_time)
+            # Бронь, начинающаяся ровно в полночь, касается и конца предыдущего дня
+            day = booking_start.date() - timedelta(days=1 if booking_start.time() == time.min else 0)
+            item = {
+                "id": row.id,
+                "start_time": booking_start.isoformat(),
+                "end_time": booking_end.isoformat(),
+                "status": row.status,
+                "user_id": row.user_id
+            }
+            while day <= booking_end.date():
+                if day in wanted:
+                    buckets[day].append(item)
+                day += timedelta(days=1)
+        return buckets
     
     async def clear_calendar_cache(self, resource_id: int):
         """Очищает кеш календаря для ресурса"""
-        redis = await get_redis()
-        pattern = f"calendar:{resource_id}:*"
-        keys = await redis.keys(pattern)
-        if keys:
-            await redis.delete(*keys)
\ No newline at end of file
+        await invalidate_calendar(resource_id)
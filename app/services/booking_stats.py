@@ -0,0 +1,172 @@
+from datetime import datetime
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..core.redis_client import get_redis, get_sync_redis
+from ..models.booking import Booking, ACTIVE_BOOKING_STATUSES, overlaps
+
+# Hash Redis: статус -> число броней. Обновляется при каждом переходе статуса
+# (создание, подтверждение, отмена, истечение), так что /admin/stats/ не
+# сканирует таблицу. Периодическая задача reconcile_booking_stats
+# выравнивает счетчики по базе, если какое-то обновление потерялось.
+STATUS_COUNTERS_KEY = "stats:bookings:status"
+# Поле-маркер засеянного hash: инкременты применяются только к счетчикам,
+# уже засеянным из базы, иначе HINCRBY создал бы неполный hash
+SEEDED_FIELD = "_seeded"
+
+# Инкременты (ARGV: маркер, затем пары статус/дельта) только для засеянного hash
+INCREMENT_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+# Засевает hash значениями из базы, если его еще никто не засеял
+SEED_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+for i = 2, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('HSET', KEYS[1], ARGV[1], 1)
+return 1
+"""
+
+BOOKING_STATUSES = ("pending", "confirmed", "cancelled")
+
+# Единицы разбивки утилизации -> интервал шага
+UTILIZATION_BUCKETS = {"hour": "1 hour", "day": "1 day"}
+
+def _transition_increments(old_status, new_status, count: int) -> dict:
+    increments = {}
+    if old_status:
+        increments[old_status] = increments.get(old_status, 0) - count
+    if new_status:
+        increments[new_status] = increments.get(new_status, 0) + count
+    return {status: delta for status, delta in increments.items() if delta}
+
+def _script_args(values: dict) -> list:
+    args = [SEEDED_FIELD]
+    for status, value in values.items():
+        args.extend((status, value))
+    return args
+
+async def record_status_change(old_status, new_status, count: int = 1):
+    """Учитывает переход count броней из old_status в new_status (None — бронь создана)"""
+    increments = _transition_increments(old_status, new_status, count)
+    if not increments:
+        return
+    redis = await get_redis()
+    await redis.register_script(INCREMENT_SCRIPT)(keys=[STATUS_COUNTERS_KEY], args=_script_args(increments))
+
+def record_status_change_sync(old_status, new_status, count: int = 1):
+    """То же для Celery-задач"""
+    increments = _transition_increments(old_status, new_status, count)
+    if not increments:
+        return
+    get_sync_redis().register_script(INCREMENT_SCRIPT)(keys=[STATUS_COUNTERS_KEY], args=_script_args(increments))
+
+def status_counts_query():
+    """Один GROUP BY вместо отдельного COUNT(*) на каждый статус"""
+    return select(Booking.status, func.count()).group_by(Booking.status)
+
+def reconcile_status_counters(db: Session) -> dict:
+    """Пересчитывает счетчики по базе и перезаписывает hash (из Celery)"""
+    counts = {status: 0 for status in BOOKING_STATUSES}
+    counts.update({status: count for status, count in db.execute(status_counts_query()) if status})
+    pipe = get_sync_redis().pipeline(transaction=True)
+    pipe.delete(STATUS_COUNTERS_KEY)
+    pipe.hset(STATUS_COUNTERS_KEY, mapping={**counts, SEEDED_FIELD: 1})
+    pipe.execute()
+    return counts
+
+class BookingStatsService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_status_counts(self) -> dict:
+        """Число броней по статусам за O(1): из счетчиков Redis, до их засева — один GROUP BY"""
+        redis = await get_redis()
+        counters = await redis.hgetall(STATUS_COUNTERS_KEY)
+        if SEEDED_FIELD not in counters:
+            result = await self.db.execute(status_counts_query())
+            counters = {status: 0 for status in BOOKING_STATUSES}
+            counters.update({status: count for status, count in result.all() if status})
+            await redis.register_script(SEED_SCRIPT)(keys=[STATUS_COUNTERS_KEY], args=_script_args(counters))
+        counters.pop(SEEDED_FIELD, None)
+        
+        counts = {status: int(counters.get(status, 0)) for status in BOOKING_STATUSES}
+        return {
+            "total_bookings": sum(int(count) for count in counters.values()),
+            "confirmed_bookings": counts["confirmed"],
+            "pending_bookings": counts["pending"],
+            "cancelled_bookings": counts["cancelled"]
+        }
+    
+    async def get_utilization(self, start_time: datetime, end_time: datetime, bucket: str = "day", resource_id: int = None) -> dict:
+        """Занятость активными бронями в окне: по интервалам (час/день) и по ресурсам.
+
+        Стоимость зависит от числа броней в окне, а не от размера таблицы.
+        Бронь, пересекающая границу интервала, делится между интервалами.
+        """
+        step = literal_column(f"interval '{UTILIZATION_BUCKETS[bucket]}'")
+        window = [
+            Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+            overlaps(start_time, end_time)
+        ]
+        if resource_id is not None:
+            window.append(Booking.resource_id == resource_id)
+        
+        # generate_series включает верхнюю границу; окно полуоткрытое, поэтому
+        # интервал, начинающийся ровно в end_time, не выводится
+        last_moment = end_time - literal_column("interval '1 microsecond'")
+        buckets = select(
+            func.generate_series(func.date_trunc(bucket, start_time), last_moment, step).label("bucket_start")
+        ).subquery()
+        bucket_end = buckets.c.bucket_start + step
+        booked_in_bucket = func.extract(
+            "epoch",
+            func.least(Booking.end_time, bucket_end, end_time)
+            - func.greatest(Booking.start_time, buckets.c.bucket_start, start_time)
+        )
+        by_bucket = await self.db.execute(
+            select(buckets.c.bucket_start, func.count(Booking.id), func.sum(booked_in_bucket))
+            .join(Booking, (Booking.start_time < bucket_end) & (Booking.end_time > buckets.c.bucket_start))
+            .where(*window)
+            .group_by(buckets.c.bucket_start)
+            .order_by(buckets.c.bucket_start)
+        )
+        
+        booked_in_window = func.extract(
+            "epoch", func.least(Booking.end_time, end_time) - func.greatest(Booking.start_time, start_time)
+        )
+        by_resource = await self.db.execute(
+            select(Booking.resource_id, func.count(Booking.id), func.sum(booked_in_window))
+            .where(*window)
+            .group_by(Booking.resource_id)
+            .order_by(Booking.resource_id)
+        )
+        
+        window_hours = (end_time - start_time).total_seconds() / 3600
+        return {
+            "bucket": bucket,
+            "buckets": [
+                {"start": bucket_start.isoformat(), "bookings": count, "booked_hours": round(float(seconds) / 3600, 2)}
+                for bucket_start, count, seconds in by_bucket.all()
+            ],
+            "resources": [
+                {
+                    "resource_id": booked_resource_id,
+                    "bookings": count,
+                    "booked_hours": round(float(seconds) / 3600, 2),
+                    "utilization": round(float(seconds) / 3600 / window_hours, 4) if window_hours else None
+                }
+                for booked_resource_id, count, seconds in by_resource.all()
+            ]
+        }
@@ -0,0 +1,131 @@
+from datetime import date, datetime
+from typing import Iterable, List, Tuple
+import math
+import random
+import time
+from ..core.metrics import CALENDAR_CACHE_LOOKUPS
+from ..core.serialization import dumps, loads
+from ..core.local_cache import local_cache, publish_invalidation, publish_invalidation_sync
+from ..core.redis_client import get_redis, get_sync_redis
+
+# Ключи календаря версионируются поколением ресурса: любое изменение броней
+# делает INCR поколения, старые записи больше не читаются и истекают по TTL.
+# Это O(1) вместо KEYS calendar:{id}:*, который блокирует Redis.
+# Поколение и корзины также лежат в локальном кеше воркера; его записи
+# ресурса сбрасываются сообщением с префиксом calendar:{id}: через pub/sub.
+
+def generation_key(resource_id: int) -> str:
+    return f"calendar:{resource_id}:gen"
+
+# Время жизни дневной корзины календаря, секунды
+CALENDAR_TTL = 300
+
+# Коэффициент XFetch: чем больше, тем раньше начинается упреждающее обновление
+XFETCH_BETA = 1.0
+
+class CacheStats:
+    """Счетчики попаданий в кеш календаря (в пределах процесса), по дням"""
+    
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+    
+    def record(self, hits: int = 0, misses: int = 0):
+        self.hits += hits
+        self.misses += misses
+        if hits:
+            _lookup_hits.inc(hits)
+        if misses:
+            _lookup_misses.inc(misses)
+    
+    def snapshot(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None
+        }
+
+_lookup_hits = CALENDAR_CACHE_LOOKUPS.labels("hit")
+_lookup_misses = CALENDAR_CACHE_LOOKUPS.labels("miss")
+
+calendar_stats = CacheStats()
+
+def day_key(resource_id: int, generation, day: date) -> str:
+    return f"calendar:{resource_id}:v{generation or 0}:{day.isoformat()}"
+
+def range_key(resource_id: int, generation, start: datetime, end: datetime) -> str:
+    """Ключ готового JSON-ответа календаря за диапазон"""
+    return f"calendar:{resource_id}:v{generation or 0}:range:{start.isoformat()}:{end.isoformat()}"
+
+def _refresh_early(delta: float, expires_at: float) -> bool:
+    """Пора ли пересчитать запись заранее.
+
+    XFetch (Vattani et al.): запись пересчитывается с вероятностью, растущей
+    по мере приближения к истечению и пропорциональной стоимости пересчета,
+    так что обычно ее обновляет один запрос до того, как она истечет у всех.
+    """
+    # 1 - random() лежит в (0, 1], логарифм определен
+    return time.time() - delta * XFETCH_BETA * math.log(1.0 - random.random()) >= expires_at
+
+def dump_bucket(items: List[dict], delta: float) -> bytes:
+    """Компактная сериализация корзины дня.
+
+    Вместе с бронями сохраняются время пересчета delta (секунды) и момент
+    логического истечения — они нужны для упреждающего обновления XFetch.
+    """
+    return dumps({"b": items, "d": round(delta, 4), "e": time.time() + CALENDAR_TTL})
+
+def load_bucket(payload: str) -> Tuple[List[dict], bool]:
+    """Разбирает корзину дня и решает, пора ли пересчитать ее заранее (XFetch)"""
+    bucket = loads(payload)
+    return bucket["b"], _refresh_early(bucket["d"], bucket["e"])
+
+def dump_range(body: bytes, delta: float) -> bytes:
+    """Готовый JSON диапазона с заголовком XFetch «истечение delta».
+
+    Заголовок отделен переводом строки, поэтому на попадании сам ответ
+    не разбирается.
+    """
+    return f"{time.time() + CALENDAR_TTL:.3f} {delta:.4f}\n".encode() + body
+
+def load_range(payload: bytes) -> Tuple[bytes, bool]:
+    """Отделяет JSON диапазона от заголовка и решает, пора ли пересчитать его заранее"""
+    header, _, body = payload.partition(b"\n")
+    expires_at, delta = (float(value) for value in header.split())
+    return body, _refresh_early(delta, expires_at)
+
+def resource_prefix(resource_id: int) -> str:
+    return f"calendar:{resource_id}:"
+
+async def get_generation(resource_id: int):
+    redis = await get_redis()
+    key = generation_key(resource_id)
+    
+    async def load():
+        return await redis.get(key) or "0"
+    
+    return await local_cache.get_or_load(key, load)
+
+async def invalidate_calendar(*resource_ids: int):
+    """Сбрасывает кеш календаря ресурсов (из API)"""
+    if not resource_ids:
+        return
+    redis = await get_redis()
+    resource_ids = set(resource_ids)
+    async with redis.pipeline(transaction=False) as pipe:
+        for resource_id in resource_ids:
+            pipe.incr(generation_key(resource_id))
+        await pipe.execute()
+    await publish_invalidation(*(resource_prefix(resource_id) for resource_id in resource_ids))
+
+def invalidate_calendar_sync(resource_ids: Iterable[int]):
+    """Сбрасывает кеш календаря ресурсов (из Celery-задач)"""
+    resource_ids = set(resource_ids)
+    if not resource_ids:
+        return
+    pipe = get_sync_redis().pipeline(transaction=False)
+    for resource_id in resource_ids:
+        pipe.incr(generation_key(resource_id))
+    pipe.execute()
+    publish_invalidation_sync(*(resource_prefix(resource_id) for resource_id in resource_ids))
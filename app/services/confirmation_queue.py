@@ -0,0 +1,64 @@
+from typing import Dict, List, Tuple
+import time
+from ..core.redis_client import get_redis, get_sync_redis
+
+# Отложенное подтверждение броней: sorted set id брони -> время (unix), когда
+# ее пора подтвердить. Вместо задачи с countdown на каждую бронь (такие задачи
+# висят неподтвержденными в памяти воркера) периодическая задача
+# drain_confirmation_queue забирает все созревшие брони и подтверждает их
+# одним UPDATE. Из очереди брони удаляются только после commit, поэтому
+# при падении пачка обработается повторно (at-least-once); UPDATE идемпотентен.
+CONFIRMATION_QUEUE_KEY = "bookings:confirmation:due"
+
+# Hash с метриками последних проходов дренажа
+CONFIRMATION_METRICS_KEY = "stats:bookings:confirmation"
+
+def schedule_confirmation_sync(due: Dict[int, float]):
+    """Ставит брони в очередь с заданными сроками (из релея outbox).
+
+    NX не сдвигает срок уже стоящей в очереди брони при повторной публикации.
+    """
+    if due:
+        get_sync_redis().zadd(CONFIRMATION_QUEUE_KEY, {str(booking_id): due_at for booking_id, due_at in due.items()}, nx=True)
+
+def due_confirmations_sync(limit: int, now: float = None) -> List[Tuple[str, float]]:
+    """Созревшие брони (id, срок) в порядке срока, не больше limit"""
+    if now is None:
+        now = time.time()
+    return get_sync_redis().zrangebyscore(
+        CONFIRMATION_QUEUE_KEY, "-inf", now, start=0, num=limit, withscores=True
+    )
+
+def ack_confirmations_sync(members: List[str]):
+    """Удаляет обработанные брони из очереди"""
+    if members:
+        get_sync_redis().zrem(CONFIRMATION_QUEUE_KEY, *members)
+
+def record_drain_sync(confirmed: int, lag: float):
+    """Сохраняет итоги прохода: число подтвержденных и отставание самой старой брони"""
+    pipe = get_sync_redis().pipeline(transaction=False)
+    pipe.hincrby(CONFIRMATION_METRICS_KEY, "confirmed_total", confirmed)
+    pipe.hset(CONFIRMATION_METRICS_KEY, mapping={"last_drain_at": time.time(), "last_lag_seconds": round(lag, 3)})
+    pipe.execute()
+
+async def confirmation_queue_stats() -> dict:
+    """Глубина очереди и текущее отставание для /admin/stats/"""
+    now = time.time()
+    redis = await get_redis()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.zcard(CONFIRMATION_QUEUE_KEY)
+        pipe.zcount(CONFIRMATION_QUEUE_KEY, "-inf", now)
+        pipe.zrange(CONFIRMATION_QUEUE_KEY, 0, 0, withscores=True)
+        pipe.hgetall(CONFIRMATION_METRICS_KEY)
+        depth, due, oldest, metrics = await pipe.execute()
+    
+    # Отставание — насколько просрочена самая старая созревшая бронь
+    lag = max(now - oldest[0][1], 0.0) if oldest else 0.0
+    return {
+        "depth": depth,
+        "due": due,
+        "lag_seconds": round(lag, 3),
+        "confirmed_total": int(metrics.get("confirmed_total", 0)),
+        "last_drain_at": float(metrics["last_drain_at"]) if "last_drain_at" in metrics else None,
+        "last_lag_seconds": float(metrics["last_lag_seconds"]) if "last_lag_seconds" in metrics else None
+    }
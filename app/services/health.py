@@ -0,0 +1,52 @@
+import asyncio
+import time
+from sqlalchemy import text
+from ..core.config import settings
+from ..core.database import async_engine, pool_status
+from ..core.redis_client import get_redis, redis_pool_status
+
+async def _timed(check) -> dict:
+    """Выполняет проверку с таймаутом health_check_timeout и меряет время"""
+    started = time.perf_counter()
+    try:
+        details = await asyncio.wait_for(check(), timeout=settings.health_check_timeout) or {}
+        status = "ok"
+    except Exception as e:
+        details = {"error": f"{type(e).__name__}: {e}"}
+        status = "error"
+    return {"status": status, "latency_ms": round((time.perf_counter() - started) * 1000, 1), **details}
+
+async def _check_postgres() -> dict:
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return {"pool": pool_status(async_engine.pool)}
+
+async def _check_redis() -> dict:
+    redis = await get_redis()
+    await redis.ping()
+    return {"pool": redis_pool_status(redis)}
+
+def _connect_broker():
+    # kombu импортируется по требованию: процессу API он нужен только для этой проверки
+    from kombu import Connection
+    with Connection(settings.rabbitmq_url, connect_timeout=settings.health_check_timeout) as connection:
+        connection.ensure_connection(max_retries=1)
+
+async def _check_broker() -> dict:
+    await asyncio.to_thread(_connect_broker)
+
+async def check_readiness() -> dict:
+    """Проверяет Postgres, Redis и брокер параллельно.
+
+    Сервис не готов, если недоступна любая зависимость или исчерпан пул
+    соединений Postgres либо Redis (новые запросы будут ждать соединения).
+    """
+    postgres, redis, broker = await asyncio.gather(
+        _timed(_check_postgres), _timed(_check_redis), _timed(_check_broker)
+    )
+    checks = {"postgres": postgres, "redis": redis, "broker": broker}
+    ready = all(
+        check["status"] == "ok" and not check.get("pool", {}).get("saturated")
+        for check in checks.values()
+    )
+    return {"status": "ready" if ready else "not_ready", "checks": checks}
@@ -0,0 +1,203 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from email.message import Message
+from typing import Dict, List, Tuple
+import os
+import queue
+import smtplib
+import threading
+import time
+from ..core.config import settings
+
+# Доставка почты из Celery-воркеров. Каждый процесс воркера держит небольшой
+# пул SMTP-соединений (STARTTLS и login выполняются один раз на соединение),
+# письма пачки отправляются по одной сессии, группами по домену получателя,
+# с ограничением частоты на домен и повторами с экспоненциальной задержкой.
+# Для тестов и бенчмарков подходит локальный aiosmtpd (SMTP_USE_TLS=false,
+# пустой SMTP_PASSWORD).
+
+def is_connection_error(error: Exception) -> bool:
+    """Ошибка, после которой соединение больше не годится.
+
+    SMTPException наследует OSError, поэтому ответы сервера отделяем явно.
+    """
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+def recipient_domain(message: Message) -> str:
+    return message["To"].rsplit("@", 1)[-1].strip(" >").lower()
+
+class DomainRateLimiter:
+    """Token bucket на домен получателя: rate писем в секунду, всплеск до burst"""
+    
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.burst = burst or max(int(rate), 1)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+    
+    def acquire(self, domain: str):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, updated = self._buckets.get(domain, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                if tokens >= 1:
+                    self._buckets[domain] = (tokens - 1, now)
+                    return
+                self._buckets[domain] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+class SMTPPool:
+    """Пул SMTP-соединений процесса; соединение, простоявшее дольше idle_timeout, проверяется NOOP"""
+    
+    def __init__(self, size: int, idle_timeout: float):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+    
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=settings.smtp_timeout)
+        try:
+            if settings.smtp_use_tls:
+                server.starttls()
+            if settings.smtp_password:
+                server.login(settings.smtp_user, settings.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < self.idle_timeout:
+                return server
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except OSError:
+                pass
+            self._close(server)
+    
+    @contextmanager
+    def connection(self):
+        """Выдает соединение; при ошибке соединения оно закрывается, иначе возвращается в пул"""
+        self._slots.acquire()
+        server = None
+        try:
+            server = self._checkout()
+            yield server
+        except Exception as e:
+            if server is not None and is_connection_error(e):
+                self._close(server)
+                server = None
+            raise
+        finally:
+            if server is not None:
+                self._idle.put((server, time.monotonic()))
+            self._slots.release()
+    
+    def _close(self, server: smtplib.SMTP):
+        try:
+            server.quit()
+        except OSError:
+            server.close()
+    
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+def _is_temporary(error: Exception) -> bool:
+    if is_connection_error(error):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return False
+
+class Mailer:
+    def __init__(self):
+        self.pool = SMTPPool(settings.smtp_pool_size, settings.smtp_idle_timeout)
+        self.limiter = DomainRateLimiter(settings.smtp_domain_rate)
+    
+    def send_batch(self, messages: List[Message]) -> Tuple[int, List[Tuple[str, str]]]:
+        """Отправляет пачку писем по одной SMTP-сессии.
+
+        Временные ошибки (разрыв соединения, коды 4xx) повторяются до
+        smtp_max_retries раз с задержкой smtp_retry_backoff * 2**попытка.
+        Возвращает (число отправленных, [(получатель, ошибка)]).
+        """
+        by_domain = defaultdict(list)
+        for message in messages:
+            by_domain[recipient_domain(message)].append(message)
+        
+        pending = [message for domain_messages in by_domain.values() for message in domain_messages]
+        failed = []
+        sent = 0
+        last_error = None
+        for attempt in range(settings.smtp_max_retries + 1):
+            if attempt:
+                time.sleep(settings.smtp_retry_backoff * 2 ** (attempt - 1))
+            retry = []
+            try:
+                with self.pool.connection() as server:
+                    for index, message in enumerate(pending):
+                        self.limiter.acquire(recipient_domain(message))
+                        try:
+                            server.send_message(message)
+                            sent += 1
+                        except OSError as e:
+                            if is_connection_error(e):
+                                # Соединение потеряно: остаток пачки повторим по новому
+                                retry.extend(pending[index:])
+                                raise
+                            last_error = e
+                            if _is_temporary(e):
+                                retry.append(message)
+                            else:
+                                failed.append((message["To"], str(e)))
+            except OSError as e:
+                if not is_connection_error(e):
+                    raise
+                if not retry:
+                    # Не удалось даже установить соединение
+                    retry = pending
+                last_error = e
+            pending = retry
+            if not pending:
+                break
+        
+        failed.extend((message["To"], str(last_error)) for message in pending)
+        return sent, failed
+    
+    def close(self):
+        self.pool.close()
+
+_mailer = None
+_mailer_pid = None
+
+def get_mailer() -> Mailer:
+    """Mailer текущего процесса; соединения не переживают fork воркера"""
+    global _mailer, _mailer_pid
+    if _mailer is None or _mailer_pid != os.getpid():
+        _mailer = Mailer()
+        _mailer_pid = os.getpid()
+    return _mailer
+
+def close_mailer():
+    if _mailer is not None and _mailer_pid == os.getpid():
+        _mailer.close()
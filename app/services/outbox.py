@@ -0,0 +1,66 @@
+from typing import List
+import time
+import uuid
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..core.redis_client import get_sync_redis
+from ..models.booking import OutboxMessage
+
+# Transactional outbox: задачи для Celery пишутся в таблицу outbox_messages в
+# той же транзакции, что и бронь, и публикуются задачей relay_outbox. Запрос
+# не ждет брокер, а бронь не остается без последующих задач, если брокер
+# недоступен. Релей публикует не реже одного раза (at-least-once); повторная
+# публикация отсекается по idempotency_key на стороне задачи.
+
+# Сообщение, которое релей не публикует в брокер, а ставит в очередь
+# подтверждения (app.services.confirmation_queue)
+CONFIRMATION_TOPIC = "booking.confirmation"
+
+CONFIRMATION_EMAILS_TASK = "app.tasks.notification_tasks.send_booking_confirmation_emails"
+
+# Сколько секунд ключ занят выполняющейся задачей и сколько хранится выполненный
+IDEMPOTENCY_LEASE = 300
+IDEMPOTENCY_TTL = 7 * 24 * 3600
+
+def idempotency_redis_key(key: str) -> str:
+    return f"outbox:processed:{key}"
+
+def booking_created_messages(booking_ids: List[int]) -> List[dict]:
+    """Сообщения outbox для новых броней: письмо-подтверждение и отложенное подтверждение"""
+    return [
+        {
+            "task_name": CONFIRMATION_EMAILS_TASK,
+            "payload": {"args": [booking_ids]},
+            "idempotency_key": uuid.uuid4().hex
+        },
+        {
+            "task_name": CONFIRMATION_TOPIC,
+            "payload": {"booking_ids": booking_ids, "due_at": time.time() + settings.booking_confirmation_delay},
+            "idempotency_key": uuid.uuid4().hex
+        }
+    ]
+
+async def add_outbox_messages(db: AsyncSession, messages: List[dict]):
+    """Добавляет сообщения в текущую транзакцию; публикуются после commit релеем"""
+    if messages:
+        await db.execute(insert(OutboxMessage), messages)
+
+def claim_idempotency_key(key: str) -> bool:
+    """Занимает ключ перед выполнением задачи; False — задача уже выполнена или выполняется.
+
+    Ключ занимается на IDEMPOTENCY_LEASE секунд, поэтому после падения
+    воркера повторная доставка снова сможет его занять.
+    """
+    if not key:
+        return True
+    return bool(get_sync_redis().set(idempotency_redis_key(key), "pending", nx=True, ex=IDEMPOTENCY_LEASE))
+
+def complete_idempotency_key(key: str):
+    if key:
+        get_sync_redis().set(idempotency_redis_key(key), "done", ex=IDEMPOTENCY_TTL)
+
+def release_idempotency_key(key: str):
+    """Освобождает ключ, если задача не выполнилась и ее можно повторить"""
+    if key:
+        get_sync_redis().delete(idempotency_redis_key(key))
@@ -0,0 +1,87 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from ..core.config import settings
+from ..core.metrics import PASSWORD_HASH_DURATION
+
+# bcrypt занимает ядро на ~250 мс. Хеширование выполняется в отдельном пуле
+# процессов ограниченного размера: event loop и пул потоков FastAPI не
+# блокируются, а при переполнении очереди запрос сразу получает 503.
+
+_contexts = {}
+
+def get_context(rounds: int = None) -> CryptContext:
+    """CryptContext с заданной стоимостью; хеши с другой стоимостью требуют обновления"""
+    rounds = rounds or settings.bcrypt_rounds
+    context = _contexts.get(rounds)
+    if context is None:
+        context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds
+        )
+        _contexts[rounds] = context
+    return context
+
+def _hash(password: str, rounds: int) -> str:
+    return get_context(rounds).hash(password)
+
+def _verify_and_update(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return get_context(rounds).verify_and_update(password, hashed_password)
+
+class PasswordHasher:
+    """Асинхронный интерфейс к пулу процессов bcrypt с ограниченной очередью"""
+    
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.max_pending = workers + queue_size
+        self.pending = 0
+        self._pool = None
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: форк процесса с работающим event loop и потоками небезопасен
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+    
+    async def _submit(self, operation: str, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            self.pending -= 1
+            PASSWORD_HASH_DURATION.labels(operation).observe(time.perf_counter() - started)
+    
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", _hash, password, settings.bcrypt_rounds)
+    
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Проверяет пароль; при смене стоимости возвращает новый хеш для сохранения"""
+        return await self._submit("verify", _verify_and_update, password, hashed_password, settings.bcrypt_rounds)
+    
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    queue_size=settings.password_hash_queue_size
+)
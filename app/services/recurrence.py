@@ -0,0 +1,56 @@
+from datetime import datetime
+from typing import List, Optional
+from dateutil.rrule import rrule, DAILY, WEEKLY, MONTHLY
+from fastapi import HTTPException
+from ..schemas.booking import BookingCreate, RecurringBookingCreate
+
+# Верхняя граница числа вхождений одной серии
+MAX_OCCURRENCES = 500
+
+FREQUENCIES = {"daily": DAILY, "weekly": WEEKLY, "monthly": MONTHLY}
+
+def _align_until(until: Optional[datetime], start_time: datetime) -> Optional[datetime]:
+    """rrule не сравнивает aware и naive даты, приводим until к виду start_time"""
+    if until is None:
+        return None
+    if start_time.tzinfo is None:
+        return until.replace(tzinfo=None) if until.tzinfo is None else until.astimezone(start_time.tzinfo).replace(tzinfo=None)
+    return until.replace(tzinfo=start_time.tzinfo) if until.tzinfo is None else until
+
+def expand_occurrences(series: RecurringBookingCreate) -> List[BookingCreate]:
+    """Разворачивает серию в список броней одинаковой длительности"""
+    if series.end_time <= series.start_time:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+    if series.count is None and series.until is None:
+        raise HTTPException(status_code=400, detail="Either count or until is required")
+    if series.count is not None and series.count > MAX_OCCURRENCES:
+        raise HTTPException(status_code=400, detail=f"Series cannot exceed {MAX_OCCURRENCES} occurrences")
+    if series.by_weekday and any(day < 0 or day > 6 for day in series.by_weekday):
+        raise HTTPException(status_code=400, detail="by_weekday values must be in 0..6")
+    
+    rule = rrule(
+        FREQUENCIES[series.frequency],
+        dtstart=series.start_time,
+        interval=series.interval,
+        count=series.count,
+        until=_align_until(series.until, series.start_time),
+        byweekday=series.by_weekday or None
+    )
+    
+    # Перебор ленивый: прерываем его сразу при превышении лимита, серия по until может быть длинной
+    starts = []
+    for start_time in rule:
+        starts.append(start_time)
+        if len(starts) > MAX_OCCURRENCES:
+            raise HTTPException(status_code=400, detail=f"Series cannot exceed {MAX_OCCURRENCES} occurrences")
+    
+    duration = series.end_time - series.start_time
+    return [
+        BookingCreate(
+            resource_id=series.resource_id,
+            start_time=start_time,
+            end_time=start_time + duration,
+            notes=series.notes
+        )
+        for start_time in starts
+    ]
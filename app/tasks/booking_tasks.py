@@ -1,26 +1,58 @@
 from celery import current_task
 from datetime import datetime, timedelta
+import time
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
+from ..core.config import settings
 from ..core.database import SessionLocal
 from ..models.booking import Booking
+from ..services.booking_stats import reconcile_status_counters, record_status_change_sync
+from ..services.calendar_cache import invalidate_calendar_sync
+from ..services.outbox import claim_idempotency_key, complete_idempotency_key, release_idempotency_key
+from ..services.confirmation_queue import ack_confirmations_sync, due_confirmations_sync, record_drain_sync
 from .celery_app import celery_app
 
 @celery_app.task
 def cleanup_expired_bookings():
-    """Очищает просроченные брони со статусом pending"""
+    """Очищает просроченные брони со статусом pending.
+
+    Отмена идет пачками по booking_cleanup_batch_size: каждая пачка — один
+    UPDATE ... RETURNING по частичному индексу ix_bookings_pending_created
+    в своей транзакции, так что блокировки держатся недолго даже после
+    длительного простоя. Строки, заблокированные другими транзакциями,
+    пропускаются и будут отменены следующим запуском.
+    """
     db = SessionLocal()
     try:
         expiry_time = datetime.utcnow() - timedelta(minutes=30)
-        expired_bookings = db.query(Booking).filter(
-            Booking.status == "pending",
-            Booking.created_at < expiry_time
-        ).all()
-        
-        for booking in expired_bookings:
-            booking.status = "cancelled"
+        batch_size = settings.booking_cleanup_batch_size
+        cancelled = 0
+        while True:
+            expired = (
+                select(Booking.id)
+                .where(Booking.status == "pending", Booking.created_at < expiry_time)
+                .order_by(Booking.created_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            rows = db.execute(
+                update(Booking)
+                .where(Booking.id.in_(expired))
+                .values(status="cancelled")
+                .returning(Booking.id, Booking.resource_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+            
+            if rows:
+                invalidate_calendar_sync(resource_id for _, resource_id in rows)
+                record_status_change_sync("pending", "cancelled", len(rows))
+                cancelled += len(rows)
+            if len(rows) < batch_size:
+                break
         
-        db.commit()
-        return f"Cancelled {len(expired_bookings)} expired bookings"
+        return f"Cancelled {cancelled} expired bookings"
     
     except Exception as e:
         db.rollback()
@@ -29,19 +61,84 @@ def cleanup_expired_bookings():
         db.close()
 
 @celery_app.task
-def confirm_booking(booking_id: int):
-    """Подтверждает бронирование"""
+def confirm_booking(booking_id: int, idempotency_key: str = None):
+    """Подтверждает бронирование.
+
+    Новые брони подтверждает drain_confirmation_queue; задача оставлена для
+    сообщений с countdown и публикаций из outbox. Повторная доставка с тем же
+    idempotency_key ничего не делает.
+    """
+    if not claim_idempotency_key(idempotency_key):
+        return f"Booking {booking_id} confirmation already processed"
+    
     db = SessionLocal()
     try:
         booking = db.query(Booking).filter(Booking.id == booking_id).first()
         if booking and booking.status == "pending":
             booking.status = "confirmed"
+            resource_id = booking.resource_id
             db.commit()
+            complete_idempotency_key(idempotency_key)
+            invalidate_calendar_sync([resource_id])
+            record_status_change_sync("pending", "confirmed")
             return f"Booking {booking_id} confirmed"
+        complete_idempotency_key(idempotency_key)
         return f"Booking {booking_id} not found or already processed"
     
     except Exception as e:
         db.rollback()
+        release_idempotency_key(idempotency_key)
         raise e
+    finally:
+        db.close()
+
+@celery_app.task
+def drain_confirmation_queue():
+    """Подтверждает созревшие брони из очереди confirmation_queue пачками по одному UPDATE"""
+    batch_size = settings.confirmation_drain_batch_size
+    db = SessionLocal()
+    try:
+        confirmed = 0
+        lag = 0.0
+        while True:
+            now = time.time()
+            due = due_confirmations_sync(batch_size, now)
+            if not due:
+                break
+            lag = max(lag, now - due[0][1])
+            
+            resource_ids = db.execute(
+                update(Booking)
+                .where(Booking.id.in_([int(member) for member, _ in due]), Booking.status == "pending")
+                .values(status="confirmed")
+                .returning(Booking.resource_id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            db.commit()
+            # Снимаем с очереди только после commit: при падении пачка повторится
+            ack_confirmations_sync([member for member, _ in due])
+            
+            invalidate_calendar_sync(resource_ids)
+            record_status_change_sync("pending", "confirmed", len(resource_ids))
+            confirmed += len(resource_ids)
+            if len(due) < batch_size:
+                break
+        
+        record_drain_sync(confirmed, lag)
+        return f"Confirmed {confirmed} bookings, lag {lag:.1f}s"
+    
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+@celery_app.task
+def reconcile_booking_stats():
+    """Выравнивает счетчики статусов броней по базе"""
+    db = SessionLocal()
+    try:
+        counts = reconcile_status_counters(db)
+        return f"Booking stats reconciled: {counts}"
     finally:
         db.close()
\ No newline at end of file
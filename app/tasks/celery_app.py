@@ -1,11 +1,14 @@
 from celery import Celery
+from celery.signals import worker_process_init
 from ..core.config import settings
+from ..core.database import engine
+from ..core.metrics import instrument_celery
 
 celery_app = Celery(
     "booking_system",
     broker=settings.rabbitmq_url,
     backend=settings.redis_url,
-    include=["app.tasks.booking_tasks", "app.tasks.notification_tasks"]
+    include=["app.tasks.booking_tasks", "app.tasks.notification_tasks", "app.tasks.outbox_tasks"]
 )
 
 celery_app.conf.update(
@@ -19,9 +22,30 @@ celery_app.conf.update(
             "task": "app.tasks.booking_tasks.cleanup_expired_bookings",
             "schedule": 300.0,  # каждые 5 минут
         },
+        "relay-outbox": {
+            "task": "app.tasks.outbox_tasks.relay_outbox",
+            "schedule": 1.0,  # каждую секунду
+        },
+        "drain-confirmation-queue": {
+            "task": "app.tasks.booking_tasks.drain_confirmation_queue",
+            "schedule": 5.0,  # каждые 5 секунд
+        },
+        "reconcile-booking-stats": {
+            "task": "app.tasks.booking_tasks.reconcile_booking_stats",
+            "schedule": 3600.0,  # каждый час
+        },
         "send-reminder-notifications": {
             "task": "app.tasks.notification_tasks.send_booking_reminders",
             "schedule": 3600.0,  # каждый час
         },
     }
-)
\ No newline at end of file
+)
+
+# Длительность задач и отставание очереди для Prometheus
+instrument_celery(settings.celery_metrics_port)
+
+# Процесс prefork наследует пул соединений родителя: соединения не закрываем
+# (ими владеет родитель), а забываем, и процесс открывает собственные
+@worker_process_init.connect
+def reset_db_pool(**kwargs):
+    engine.dispose(close=False)
@@ -1,17 +1,92 @@
-import smtplib
+import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from typing import List
+from celery.signals import worker_process_shutdown
+from sqlalchemy import select, update, func, tuple_
+from sqlalchemy.orm import Session, joinedload
 from ..core.database import SessionLocal
 from ..core.config import settings
-from ..models.booking import Booking, User
+from ..services.mailer import get_mailer, close_mailer
+from ..services.outbox import claim_idempotency_key, complete_idempotency_key, release_idempotency_key
+from ..models.booking import Booking, Resource, User
 from .celery_app import celery_app
 
+logger = logging.getLogger(__name__)
+
+def _confirmation_message(booking: Booking) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg['From'] = settings.smtp_user
+    msg['To'] = booking.user.email
+    msg['Subject'] = f"Booking Confirmation - {settings.app_name}"
+    
+    body = f"""
+    Dear {booking.user.username},
+    
+    Your booking has been confirmed!
+    
+    Details:
+    - Resource: {booking.resource.name}
+    - Date: {booking.start_time.strftime('%Y-%m-%d')}
+    - Time: {booking.start_time.strftime('%H:%M')} - {booking.end_time.strftime('%H:%M')}
+    - Status: {booking.status}
+    
+    Thank you for using {settings.app_name}!
+    """
+    
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+def _reminder_payload(booking_id: int, email: str, username: str, resource_name: str, start_time: datetime, end_time: datetime) -> dict:
+    """Готовое к отправке напоминание; сериализуется в JSON для задачи доставки"""
+    body = f"""
+    Dear {username},
+    
+    This is a reminder about your upcoming booking:
+    
+    - Resource: {resource_name}
+    - Date: {start_time.strftime('%Y-%m-%d')}
+    - Time: {start_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}
+    
+    Don't forget about your appointment!
+    
+    Best regards,
+    {settings.app_name} Team
+    """
+    return {
+        "booking_id": booking_id,
+        "to": email,
+        "subject": f"Booking Reminder - {settings.app_name}",
+        "body": body
+    }
+
+def _payload_message(payload: dict) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg['From'] = settings.smtp_user
+    msg['To'] = payload["to"]
+    msg['Subject'] = payload["subject"]
+    msg.attach(MIMEText(payload["body"], 'plain'))
+    return msg
+
+def _reminder_message(booking: Booking) -> MIMEMultipart:
+    return _payload_message(_reminder_payload(
+        booking.id,
+        booking.user.email,
+        booking.user.username,
+        booking.resource.name,
+        booking.start_time,
+        booking.end_time
+    ))
+
+@worker_process_shutdown.connect
+def close_smtp_connections(**kwargs):
+    close_mailer()
+
 @celery_app.task
 def send_booking_confirmation_email(booking_id: int):
     """Отправляет email подтверждения бронирования"""
-    if not settings.smtp_user or not settings.smtp_password:
+    if not settings.smtp_user:
         return "Email settings not configured"
     
     db = SessionLocal()
@@ -20,32 +95,9 @@ def send_booking_confirmation_email(booking_id: int):
         if not booking:
             return f"Booking {booking_id} not found"
         
-        msg = MIMEMultipart()
-        msg['From'] = settings.smtp_user
-        msg['To'] = booking.user.email
-        msg['Subject'] = f"Booking Confirmation - {settings.app_name}"
-        
-        body = f"""
-        Dear {booking.user.username},
-        
-        Your booking has been confirmed!
-        
-        Details:
-        - Resource: {booking.resource.name}
-        - Date: {booking.start_time.strftime('%Y-%m-%d')}
-        - Time: {booking.start_time.strftime('%H:%M')} - {booking.end_time.strftime('%H:%M')}
-        - Status: {booking.status}
-        
-        Thank you for using {settings.app_name}!
-        """
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        server = smtplib.SMTP(settings.smtp_host, settings.smtp_port)
-        server.starttls()
-        server.login(settings.smtp_user, settings.smtp_password)
-        server.send_message(msg)
-        server.quit()
+        _, failed = get_mailer().send_batch([_confirmation_message(booking)])
+        if failed:
+            return f"Failed to send email: {failed[0][1]}"
         
         return f"Confirmation email sent to {booking.user.email}"
     
@@ -54,40 +106,154 @@ def send_booking_confirmation_email(booking_id: int):
     finally:
         db.close()
 
+@celery_app.task(bind=True)
+def send_booking_confirmation_emails(self, booking_ids: List[int], idempotency_key: str = None):
+    """Отправляет подтверждения пакета броней одним запросом и одной SMTP-сессией.
+
+    Публикуется релеем outbox; повторная доставка с тем же idempotency_key
+    писем не дублирует. При ошибке ключ освобождается и задача повторяется.
+    """
+    if not settings.smtp_user:
+        return "Email settings not configured"
+    if not claim_idempotency_key(idempotency_key):
+        return "Confirmation emails already sent"
+    
+    db = SessionLocal()
+    try:
+        bookings = db.query(Booking).options(
+            joinedload(Booking.user), joinedload(Booking.resource)
+        ).filter(Booking.id.in_(booking_ids)).all()
+        if not bookings:
+            complete_idempotency_key(idempotency_key)
+            return "Bookings not found"
+        
+        sent_count, failed = get_mailer().send_batch([_confirmation_message(booking) for booking in bookings])
+        complete_idempotency_key(idempotency_key)
+        for email, error in failed:
+            logger.warning("Failed to send confirmation to %s: %s", email, error)
+        
+        return f"Sent {sent_count} of {len(bookings)} confirmation emails"
+    
+    except Exception as e:
+        release_idempotency_key(idempotency_key)
+        raise self.retry(exc=e)
+    finally:
+        db.close()
+
 @celery_app.task
 def send_booking_reminders():
-    """Отправляет напоминания о предстоящих бронированиях"""
+    """Отправляет напоминания о завтрашних бронях пачками по reminder_chunk_size.
+
+    Пачка помечается reminder_sent_at и публикуется в send_reminder_emails до commit.
+    """
+    if not settings.smtp_user:
+        return "Email settings not configured"
+    
     db = SessionLocal()
     try:
         tomorrow = datetime.utcnow() + timedelta(days=1)
         start_of_day = tomorrow.replace(hour=0, minute=0, second=0, microsecond=0)
         end_of_day = tomorrow.replace(hour=23, minute=59, second=59, microsecond=999999)
         
-        upcoming_bookings = db.query(Booking).join(User).filter(
-            Booking.status == "confirmed",
-            Booking.start_time >= start_of_day,
-            Booking.start_time <= end_of_day
-        ).all()
+        chunk_size = settings.reminder_chunk_size
+        queued_count = 0
+        after = None
+        while True:
+            due = select(Booking.id).where(
+                Booking.status == "confirmed",
+                Booking.reminder_sent_at.is_(None),
+                Booking.start_time >= start_of_day,
+                Booking.start_time <= end_of_day
+            )
+            if after is not None:
+                due = due.where(tuple_(Booking.start_time, Booking.id) > after)
+            due = due.order_by(Booking.start_time, Booking.id).limit(chunk_size).with_for_update(skip_locked=True)
+            
+            claimed = (
+                update(Booking)
+                .where(Booking.id.in_(due.scalar_subquery()))
+                .values(reminder_sent_at=func.now())
+                .returning(Booking.id, Booking.user_id, Booking.resource_id, Booking.start_time, Booking.end_time)
+                .cte("claimed")
+            )
+            rows = db.execute(
+                select(
+                    claimed.c.id,
+                    User.email,
+                    User.username,
+                    Resource.name,
+                    claimed.c.start_time,
+                    claimed.c.end_time
+                )
+                .join(User, User.id == claimed.c.user_id)
+                .join(Resource, Resource.id == claimed.c.resource_id)
+                .order_by(claimed.c.start_time, claimed.c.id)
+            ).all()
+            if not rows:
+                db.commit()
+                break
+            
+            send_reminder_emails.delay([_reminder_payload(*row) for row in rows])
+            db.commit()
+            queued_count += len(rows)
+            after = (rows[-1].start_time, rows[-1].id)
+            if len(rows) < chunk_size:
+                break
         
-        sent_count = 0
-        for booking in upcoming_bookings:
-            try:
-                send_reminder_email.delay(booking.id)
-                sent_count += 1
-            except Exception as e:
-                print(f"Failed to queue reminder for booking {booking.id}: {e}")
-        
-        return f"Queued {sent_count} reminder emails"
+        return f"Queued {queued_count} reminder emails"
     
     except Exception as e:
+        db.rollback()
         return f"Failed to process reminders: {str(e)}"
     finally:
         db.close()
 
+def _release_reminders(booking_ids: List[int]):
+    """Снимает пометку reminder_sent_at: брони снова попадут в рассылку"""
+    if not booking_ids:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Booking)
+            .where(Booking.id.in_(booking_ids))
+            .values(reminder_sent_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+@celery_app.task
+def send_reminder_emails(payloads: List[dict]):
+    """Отправляет пачку готовых напоминаний; неотправленные снова станут доступны рассылке"""
+    if not settings.smtp_user:
+        _release_reminders([payload["booking_id"] for payload in payloads])
+        return "Email settings not configured"
+    
+    try:
+        sent_count, failed = get_mailer().send_batch([_payload_message(payload) for payload in payloads])
+    except Exception:
+        # Неизвестно, что успело уйти; повторная рассылка лучше потерянной
+        _release_reminders([payload["booking_id"] for payload in payloads])
+        raise
+    
+    if failed:
+        failed_emails = {email for email, _ in failed}
+        _release_reminders([payload["booking_id"] for payload in payloads if payload["to"] in failed_emails])
+        for email, error in failed:
+            logger.warning("Failed to send reminder to %s: %s", email, error)
+    
+    return f"Sent {sent_count} of {len(payloads)} reminder emails"
+
 @celery_app.task
 def send_reminder_email(booking_id: int):
-    """Отправляет напоминание о бронировании"""
-    if not settings.smtp_user or not settings.smtp_password:
+    """Отправляет напоминание о бронировании.
+
+    Рассылка идет через send_reminder_emails; задача оставлена для
+    сообщений, поставленных в очередь до перехода на пачки.
+    """
+    if not settings.smtp_user:
         return "Email settings not configured"
     
     db = SessionLocal()
@@ -96,33 +262,9 @@ def send_reminder_email(booking_id: int):
         if not booking:
             return f"Booking {booking_id} not found"
         
-        msg = MIMEMultipart()
-        msg['From'] = settings.smtp_user
-        msg['To'] = booking.user.email
-        msg['Subject'] = f"Booking Reminder - {settings.app_name}"
-        
-        body = f"""
-        Dear {booking.user.username},
-        
-        This is a reminder about your upcoming booking:
-        
-        - Resource: {booking.resource.name}
-        - Date: {booking.start_time.strftime('%Y-%m-%d')}
-        - Time: {booking.start_time.strftime('%H:%M')} - {booking.end_time.strftime('%H:%M')}
-        
-        Don't forget about your appointment!
-        
-        Best regards,
-        {settings.app_name} Team
-        """
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        server = smtplib.SMTP(settings.smtp_host, settings.smtp_port)
-        server.starttls()
-        server.login(settings.smtp_user, settings.smtp_password)
-        server.send_message(msg)
-        server.quit()
+        _, failed = get_mailer().send_batch([_reminder_message(booking)])
+        if failed:
+            return f"Failed to send reminder: {failed[0][1]}"
         
         return f"Reminder email sent to {booking.user.email}"
     
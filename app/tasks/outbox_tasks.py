@@ -0,0 +1,76 @@
+import logging
+from sqlalchemy import select, delete
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.booking import OutboxMessage
+from ..services.confirmation_queue import schedule_confirmation_sync
+from ..services.outbox import CONFIRMATION_TOPIC
+from .celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+@celery_app.task
+def relay_outbox():
+    """Публикует накопившиеся сообщения outbox пачками по outbox_relay_batch_size.
+
+    Сообщения пачки блокируются FOR UPDATE SKIP LOCKED, публикуются через одно
+    соединение с брокером и удаляются в той же транзакции. Если релей упадет
+    после публикации, но до commit, сообщения уйдут повторно — задачи
+    отсекают дубли по idempotency_key.
+    """
+    batch_size = settings.outbox_relay_batch_size
+    db = SessionLocal()
+    try:
+        relayed = 0
+        while True:
+            messages = db.execute(
+                select(OutboxMessage)
+                .order_by(OutboxMessage.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not messages:
+                break
+            
+            # Очередь подтверждения — Redis, а не брокер: одна запись на пачку
+            confirmations = [message for message in messages if message.task_name == CONFIRMATION_TOPIC]
+            schedule_confirmation_sync({
+                booking_id: message.payload["due_at"]
+                for message in confirmations
+                for booking_id in message.payload["booking_ids"]
+            })
+            published = [message.id for message in confirmations]
+            
+            failed = False
+            try:
+                with celery_app.producer_or_acquire() as producer:
+                    for message in messages:
+                        if message.task_name == CONFIRMATION_TOPIC:
+                            continue
+                        celery_app.send_task(
+                            message.task_name,
+                            args=message.payload.get("args", []),
+                            kwargs={**message.payload.get("kwargs", {}), "idempotency_key": message.idempotency_key},
+                            task_id=message.idempotency_key,
+                            producer=producer
+                        )
+                        published.append(message.id)
+            except Exception:
+                # Опубликованное удаляем, остальное повторит следующий запуск
+                logger.warning("Failed to relay outbox messages", exc_info=True)
+                failed = True
+            
+            if published:
+                db.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(published)))
+            db.commit()
+            relayed += len(published)
+            if failed or len(messages) < batch_size:
+                break
+        
+        return f"Relayed {relayed} outbox messages"
+    
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
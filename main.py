@@ -1,29 +1,55 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from app.core.database import get_db, engine
+from app.core.database import get_db, async_engine, AsyncSessionLocal
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.serialization import ORJSONResponse, dumps
+from app.core.startup import warm_up
 from app.models import booking as models
 from app.schemas import booking as schemas
-from app.services.auth import authenticate_user, create_access_token, get_current_user, get_password_hash
+from app.services.auth import authenticate_user, create_user_token, get_current_user
+from app.services.password_hashing import password_hasher
 from app.services.booking import BookingService
-from app.tasks.notification_tasks import send_booking_confirmation_email
-from app.tasks.booking_tasks import confirm_booking
+from app.services.booking_stats import BookingStatsService, record_status_change
+from app.services.calendar_cache import calendar_stats
+from app.services.confirmation_queue import confirmation_queue_stats
+from app.core.local_cache import local_cache, publish_invalidation, listen_for_invalidations
+from app.services.recurrence import expand_occurrences
+from app.services.health import check_readiness
 
+# Схемой базы управляет Alembic (alembic upgrade head), импорт модуля
+# не обращается ни к базе, ни к брокеру: задачи Celery здесь не импортируются,
+# API публикует их через outbox.
 
-# Создаем таблицы
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_up()
+    cache_listener = asyncio.create_task(listen_for_invalidations())
+    yield
+    cache_listener.cancel()
+    password_hasher.shutdown()
+    await async_engine.dispose()
 
 app = FastAPI(
     title=settings.app_name,
     description="Система бронирования с календарем и уведомлениями",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Ключ списка активных ресурсов в локальном кеше
+RESOURCES_CACHE_KEY = "resources:active"
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -33,30 +59,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Латентность маршрутов и SQL на запрос для /metrics
+app.add_middleware(MetricsMiddleware)
+
 # === AUTH ENDPOINTS ===
 @app.post("/auth/register", response_model=schemas.UserResponse)
-def register(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     # Проверяем существование пользователя
-    if db.query(models.User).filter(models.User.email == user_data.email).first():
+    if await db.scalar(select(models.User.id).where(models.User.email == user_data.email)):
         raise HTTPException(status_code=400, detail="Email already registered")
-    if db.query(models.User).filter(models.User.username == user_data.username).first():
+    if await db.scalar(select(models.User.id).where(models.User.username == user_data.username)):
         raise HTTPException(status_code=400, detail="Username already taken")
     
     # Создаем пользователя
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     user = models.User(
         email=user_data.email,
         username=user_data.username,
         hashed_password=hashed_password
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 @app.post("/auth/token", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -64,61 +93,100 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    access_token = create_user_token(user, expires_delta=access_token_expires)
     return {"access_token": access_token, "token_type": "bearer"}
 
 # === RESOURCE ENDPOINTS ===
 @app.post("/resources/", response_model=schemas.ResourceResponse)
-def create_resource(
+async def create_resource(
     resource_data: schemas.ResourceCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
     resource = models.Resource(**resource_data.dict())
     db.add(resource)
-    db.commit()
-    db.refresh(resource)
+    await db.commit()
+    await db.refresh(resource)
+    await publish_invalidation(RESOURCES_CACHE_KEY)
     return resource
 
 @app.get("/resources/", response_model=List[schemas.ResourceResponse])
-def get_resources(db: Session = Depends(get_db)):
-    return db.query(models.Resource).filter(models.Resource.is_active == True).all()
+async def get_resources(db: AsyncSession = Depends(get_db)):
+    async def load():
+        result = await db.execute(select(models.Resource).where(models.Resource.is_active == True))
+        return [schemas.ResourceResponse.model_validate(resource).model_dump() for resource in result.scalars().all()]
+    
+    return await local_cache.get_or_load(
+        RESOURCES_CACHE_KEY, load, size=lambda resources: len(dumps(resources))
+    )
 
 # === BOOKING ENDPOINTS ===
 @app.post("/bookings/", response_model=schemas.BookingResponse)
 async def create_booking(
     booking_data: schemas.BookingCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
+    # Уведомление и подтверждение ставятся в outbox в транзакции брони
     booking_service = BookingService(db)
-    booking = await booking_service.create_booking(current_user.id, booking_data)
-    
-    # Отправляем задачу на подтверждение и уведомление
-    send_booking_confirmation_email.delay(booking.id)
-    confirm_booking.apply_async(args=[booking.id], countdown=60)  # подтверждаем через минуту
-    
-    return booking
+    return await booking_service.create_booking(current_user.id, booking_data)
+
+@app.post("/bookings/bulk", response_model=schemas.BulkBookingResponse)
+async def create_bookings_bulk(
+    bulk_data: schemas.BulkBookingCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user)
+):
+    booking_service = BookingService(db)
+    created, rejected = await booking_service.create_bookings(
+        current_user.id, bulk_data.bookings, all_or_nothing=bulk_data.all_or_nothing
+    )
+    return {"created": created, "rejected": rejected}
+
+@app.post("/bookings/recurring", response_model=schemas.BulkBookingResponse)
+async def create_recurring_bookings(
+    series: schemas.RecurringBookingCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user)
+):
+    booking_service = BookingService(db)
+    created, rejected = await booking_service.create_bookings(
+        current_user.id, expand_occurrences(series), all_or_nothing=series.all_or_nothing
+    )
+    return {"created": created, "rejected": rejected}
 
-@app.get("/bookings/", response_model=List[schemas.BookingResponse])
-def get_user_bookings(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+@app.get("/bookings/", response_model=schemas.BookingList)
+async def get_user_bookings(
+    status: Optional[str] = None,
+    resource_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, gt=0, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
-    return db.query(models.Booking).filter(models.Booking.user_id == current_user.id).all()
+    booking_service = BookingService(db)
+    bookings, next_cursor = await booking_service.list_bookings(
+        user_id=current_user.id,
+        status=status,
+        resource_id=resource_id,
+        date_from=date_from,
+        date_to=date_to,
+        cursor=cursor,
+        limit=limit
+    )
+    # Без валидации BookingResponse на каждую строку: схема та же, см. booking_to_dict
+    return ORJSONResponse({"bookings": [schemas.booking_to_dict(booking) for booking in bookings], "next_cursor": next_cursor})
 
 @app.get("/bookings/{booking_id}", response_model=schemas.BookingResponse)
-def get_booking(
+async def get_booking(
     booking_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
-    booking = db.query(models.Booking).filter(
-        models.Booking.id == booking_id,
-        models.Booking.user_id == current_user.id
-    ).first()
+    booking_service = BookingService(db)
+    booking = await booking_service.get_booking(booking_id, user_id=current_user.id)
     
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
@@ -126,22 +194,28 @@ def get_booking(
     return booking
 
 @app.delete("/bookings/{booking_id}")
-def cancel_booking(
+async def cancel_booking(
     booking_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
-    booking = db.query(models.Booking).filter(
-        models.Booking.id == booking_id,
-        models.Booking.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(models.Booking).where(
+            models.Booking.id == booking_id,
+            models.Booking.user_id == current_user.id
+        )
+    )
+    booking = result.scalars().first()
     
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     
     # Отменяем бронирование
+    previous_status = booking.status
     booking.status = "cancelled"
-    db.commit()
+    await db.commit()
+    await BookingService(db).clear_calendar_cache(booking.resource_id)
+    await record_status_change(previous_status, "cancelled")
     
     return {"detail": "Booking cancelled successfully"}
 
@@ -151,56 +225,137 @@ async def get_calendar(
     resource_id: int,
     start_date: datetime,
     end_date: datetime,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     booking_service = BookingService(db)
-    calendar_data = await booking_service.get_calendar(resource_id, start_date, end_date)
-    return calendar_data
+    body = await booking_service.get_calendar_json(resource_id, start_date, end_date)
+    return Response(content=body, media_type="application/json")
 
 @app.get("/calendar/{resource_id}/availability")
 async def check_availability(
     resource_id: int,
     start_time: datetime,
     end_time: datetime,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     booking_service = BookingService(db)
     is_available = await booking_service.check_availability(resource_id, start_time, end_time)
     return {"available": is_available}
 
+@app.get("/availability/search", response_model=List[schemas.AvailableSlot])
+async def search_availability(
+    start_time: datetime,
+    end_time: datetime,
+    duration_minutes: int = Query(60, gt=0),
+    min_capacity: int = Query(1, ge=1),
+    resource_ids: Optional[List[int]] = Query(None),
+    limit: int = Query(10, gt=0, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    if end_time <= start_time:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+    
+    booking_service = BookingService(db)
+    return await booking_service.search_free_slots(
+        start_time,
+        end_time,
+        timedelta(minutes=duration_minutes),
+        min_capacity=min_capacity,
+        resource_ids=resource_ids,
+        limit=limit
+    )
+
 # === ADMIN ENDPOINTS ===
-@app.get("/admin/bookings/", response_model=List[schemas.BookingResponse])
-def get_all_bookings(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+@app.get("/admin/bookings/", response_model=schemas.BookingList)
+async def get_all_bookings(
+    status: Optional[str] = None,
+    resource_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, gt=0, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
     # В реальном проекте добавить проверку прав администратора
-    return db.query(models.Booking).offset(skip).limit(limit).all()
+    booking_service = BookingService(db)
+    bookings, next_cursor = await booking_service.list_bookings(
+        status=status,
+        resource_id=resource_id,
+        date_from=date_from,
+        date_to=date_to,
+        cursor=cursor,
+        limit=limit
+    )
+    return ORJSONResponse({"bookings": [schemas.booking_to_dict(booking) for booking in bookings], "next_cursor": next_cursor})
+
+@app.get("/admin/bookings/export")
+async def export_bookings(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: Optional[str] = None,
+    resource_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    current_user: schemas.CurrentUser = Depends(get_current_user)
+):
+    # В реальном проекте добавить проверку прав администратора
+    async def generate():
+        # Своя сессия: ответ стримится дольше, чем живут зависимости запроса
+        async with AsyncSessionLocal() as db:
+            async for chunk in BookingService(db).export_bookings(
+                format, status=status, resource_id=resource_id, date_from=date_from, date_to=date_to
+            ):
+                yield chunk
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=bookings.{format}"}
+    )
+
+@app.get("/admin/cache/stats")
+async def get_cache_stats(current_user: schemas.CurrentUser = Depends(get_current_user)):
+    # Счетчики текущего воркера
+    return {"calendar": calendar_stats.snapshot()}
 
 @app.get("/admin/stats/")
-def get_booking_stats(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+async def get_booking_stats(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    bucket: str = Query("day", pattern="^(hour|day)$"),
+    resource_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
-    total_bookings = db.query(models.Booking).count()
-    confirmed_bookings = db.query(models.Booking).filter(models.Booking.status == "confirmed").count()
-    pending_bookings = db.query(models.Booking).filter(models.Booking.status == "pending").count()
-    cancelled_bookings = db.query(models.Booking).filter(models.Booking.status == "cancelled").count()
+    stats_service = BookingStatsService(db)
+    stats = await stats_service.get_status_counts()
+    stats["confirmation_queue"] = await confirmation_queue_stats()
+    
+    # Утилизация считается только для запрошенного окна
+    if start_time and end_time:
+        if end_time <= start_time:
+            raise HTTPException(status_code=400, detail="end_time must be after start_time")
+        stats["utilization"] = await stats_service.get_utilization(start_time, end_time, bucket, resource_id)
     
-    return {
-        "total_bookings": total_bookings,
-        "confirmed_bookings": confirmed_bookings,
-        "pending_bookings": pending_bookings,
-        "cancelled_bookings": cancelled_bookings
-    }
+    return stats
 
 # === HEALTH CHECK ===
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+@app.get("/health/ready")
+async def readiness_check():
+    readiness = await check_readiness()
+    status_code = 200 if readiness["status"] == "ready" else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(content=readiness, status_code=status_code)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,48 @@
+"""Бенчмарк BookingService.check_availability на больших объемах броней.
+
+Данные генерируются в отдельной схеме PostgreSQL (по умолчанию ``bench``),
+рабочие таблицы не затрагиваются. Запуск:
+
+    python scripts/bench_availability.py            # 10k, 1M, 10M
+    python scripts/bench_availability.py 10000 100000
+"""
+import asyncio
+import random
+import sys
+import time
+from datetime import timedelta
+
+from bench_common import EPOCH, bench_database, percentiles, populate
+
+from app.services.booking import BookingService
+
+RESOURCES = 1000
+QUERIES = 2000
+
+
+async def measure(session_factory, total_bookings: int):
+    """Возвращает (p50, p99) времени check_availability в миллисекундах"""
+    hours = max(total_bookings // RESOURCES, 1)
+    timings = []
+    async with session_factory() as db:
+        service = BookingService(db)
+        for _ in range(QUERIES):
+            start = EPOCH + timedelta(hours=random.randrange(hours), minutes=random.randrange(60))
+            began = time.perf_counter()
+            await service.check_availability(random.randint(1, RESOURCES), start, start + timedelta(minutes=90))
+            timings.append((time.perf_counter() - began) * 1000)
+    return percentiles(timings)
+
+
+async def main(sizes):
+    async with bench_database() as (engine, session_factory):
+        print(f"{'bookings':>12} {'p50, ms':>10} {'p99, ms':>10}")
+        for size in sizes:
+            await populate(engine, size, RESOURCES)
+            p50, p99 = await measure(session_factory, size)
+            print(f"{size:>12} {p50:>10.3f} {p99:>10.3f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 1_000_000, 10_000_000]
+    asyncio.run(main(sizes))
@@ -0,0 +1,71 @@
+"""Бенчмарк холодного старта API: время импорта main.py и время от запуска
+процесса uvicorn до первого обслуженного запроса (GET /health).
+
+Нужны доступные Postgres и Redis из .env (их прогревает lifespan). Запуск:
+
+    python scripts/bench_cold_start.py [runs]
+
+Если задан COLD_START_BUDGET_S, медиана выше бюджета завершает скрипт
+с ненулевым кодом — так регрессию видно в CI.
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_PROBE = "import time; began = time.perf_counter(); import main; print(time.perf_counter() - began)"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_first_request(timeout: float = 60.0) -> float:
+    port = free_port()
+    began = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - began < timeout:
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - began
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.01)
+        raise TimeoutError(f"Server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(runs: int = 5):
+    imports = [measure_import() for _ in range(runs)]
+    starts = [measure_first_request() for _ in range(runs)]
+    print(f"import main:          median {statistics.median(imports) * 1000:.0f} ms, max {max(imports) * 1000:.0f} ms")
+    print(f"start to 1st request: median {statistics.median(starts) * 1000:.0f} ms, max {max(starts) * 1000:.0f} ms")
+    
+    budget = os.getenv("COLD_START_BUDGET_S")
+    if budget and statistics.median(starts) > float(budget):
+        print(f"❌ Cold start exceeds budget of {budget}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
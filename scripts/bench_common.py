@@ -0,0 +1,86 @@
+"""Общие помощники бенчмарков: отдельная схема PostgreSQL и генерация данных."""
+import os
+import statistics
+import sys
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Отдельная база Redis, чтобы данные бенчмарков не попали в рабочий кеш
+os.environ["REDIS_URL"] = os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15")
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models import booking as models  # noqa: F401  регистрирует таблицы в Base.metadata
+
+SCHEMA = os.getenv("BENCH_SCHEMA", "bench")
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@asynccontextmanager
+async def bench_database():
+    """Движок и фабрика сессий, работающие в схеме SCHEMA; схема удаляется на выходе"""
+    engine = create_async_engine(
+        settings.async_database_url,
+        connect_args={"server_settings": {"search_path": f"{SCHEMA},public"}}
+    )
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        yield engine, session_factory
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    finally:
+        await engine.dispose()
+
+
+async def populate(engine, total_bookings: int, resources: int):
+    """Пересоздает схему и заполняет ее бронями: часовые слоты подряд на каждом ресурсе.
+
+    Каждая четвертая бронь отменена, остальные pending/confirmed.
+    """
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist SCHEMA public"))
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(
+            "INSERT INTO users (email, username, hashed_password, is_active) "
+            "VALUES ('bench@example.com', 'bench', '-', true)"
+        ))
+        await conn.execute(text(
+            "INSERT INTO resources (name, capacity, is_active) "
+            "SELECT 'Resource ' || g, 1, true FROM generate_series(1, :n) g"
+        ), {"n": resources})
+        await conn.execute(text(
+            """
+            INSERT INTO bookings (user_id, resource_id, start_time, end_time, status)
+            SELECT 1,
+                   g % :resources + 1,
+                   CAST(:epoch AS timestamptz) + (g / :resources) * interval '1 hour',
+                   CAST(:epoch AS timestamptz) + (g / :resources + 1) * interval '1 hour',
+                   (ARRAY['pending', 'confirmed', 'confirmed', 'cancelled'])[g % 4 + 1]
+            FROM generate_series(0, :n - 1) g
+            """
+        ), {"resources": resources, "epoch": EPOCH, "n": total_bookings})
+        await conn.execute(text("ANALYZE"))
+
+
+class QueryCounter:
+    """Считает SQL-запросы, выполненные через движок"""
+    
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+    
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def percentiles(timings):
+    """(p50, p99) списка замеров"""
+    quantiles = statistics.quantiles(timings, n=100)
+    return quantiles[49], quantiles[98]
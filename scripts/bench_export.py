@@ -0,0 +1,48 @@
+"""Бенчмарк потоковой выгрузки броней: 5M строк при ограниченной памяти.
+
+Выгрузка идет через BookingService.export_bookings, вывод отбрасывается.
+Пиковый RSS процесса должен оставаться ниже RSS_LIMIT_MB независимо от
+числа строк. Запуск:
+
+    python scripts/bench_export.py [rows] [ndjson|csv]
+"""
+import asyncio
+import resource
+import sys
+import time
+
+from bench_common import bench_database, populate
+
+from app.services.booking import BookingService
+
+RSS_LIMIT_MB = 256
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss в Linux — килобайты
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def main(rows: int, fmt: str):
+    async with bench_database() as (engine, session_factory):
+        await populate(engine, rows, 1000)
+        rss_before = peak_rss_mb()
+        
+        exported_bytes = 0
+        began = time.perf_counter()
+        async with session_factory() as db:
+            async for chunk in BookingService(db).export_bookings(fmt):
+                exported_bytes += len(chunk)
+        elapsed = time.perf_counter() - began
+        
+        rss_after = peak_rss_mb()
+        print(f"{rows} rows as {fmt}: {exported_bytes / 2**20:.0f} MiB in {elapsed:.1f} s "
+              f"({rows / elapsed:,.0f} rows/s)")
+        print(f"peak RSS: {rss_before:.0f} MiB before, {rss_after:.0f} MiB after (limit {RSS_LIMIT_MB} MiB)")
+        assert rss_after < RSS_LIMIT_MB, "Export memory is not bounded"
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    fmt = sys.argv[2] if len(sys.argv) > 2 else "ndjson"
+    asyncio.run(main(rows, fmt))
@@ -0,0 +1,77 @@
+"""Бенчмарк входа: пропускная способность /auth/token и задержка обычного
+эндпоинта во время всплеска логинов.
+
+Запускается против работающего приложения:
+
+    python scripts/bench_login.py [logins] [concurrency]
+"""
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def probe_latency(stop: threading.Event, timings: list):
+    """Непрерывно опрашивает GET /resources/ и собирает задержки в мс"""
+    session = requests.Session()
+    while not stop.is_set():
+        began = time.perf_counter()
+        session.get(f"{BASE_URL}/resources/")
+        timings.append((time.perf_counter() - began) * 1000)
+
+
+def summarize(name: str, timings: list):
+    if len(timings) < 2:
+        print(f"{name}: not enough samples")
+        return
+    quantiles = statistics.quantiles(timings, n=100)
+    print(f"{name}: p50 {quantiles[49]:.1f} ms, p99 {quantiles[98]:.1f} ms ({len(timings)} requests)")
+
+
+def bench_login(logins: int = 200, concurrency: int = 50):
+    suffix = uuid.uuid4().hex[:8]
+    credentials = {"username": f"bench_{suffix}", "password": "benchpass123"}
+    requests.post(f"{BASE_URL}/auth/register", json={
+        "email": f"bench_{suffix}@example.com", **credentials
+    }).raise_for_status()
+    
+    # Задержка без нагрузки
+    stop = threading.Event()
+    idle = []
+    prober = threading.Thread(target=probe_latency, args=(stop, idle))
+    prober.start()
+    time.sleep(3)
+    stop.set()
+    prober.join()
+    
+    # Задержка во время всплеска логинов
+    stop = threading.Event()
+    loaded = []
+    prober = threading.Thread(target=probe_latency, args=(stop, loaded))
+    prober.start()
+    
+    def login(_):
+        return requests.post(f"{BASE_URL}/auth/token", data=credentials).status_code
+    
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        codes = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - began
+    stop.set()
+    prober.join()
+    
+    print(f"{logins} logins, {concurrency} concurrent: {codes.count(200) / elapsed:.1f} successful logins/s, "
+          f"{codes.count(503)} rejected with 503, other: {sorted(set(c for c in codes if c not in (200, 503)))}")
+    summarize("GET /resources/ idle", idle)
+    summarize("GET /resources/ during login burst", loaded)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    bench_login(*args)
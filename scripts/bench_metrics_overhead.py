@@ -0,0 +1,101 @@
+"""Бенчмарк накладных расходов метрик: MetricsMiddleware и события SQLAlchemy.
+
+Запросы подаются прямо в ASGI-приложение (без сети и HTTP-клиента), так что
+разница времени — это стоимость самого инструментирования. Бюджет —
+OVERHEAD_BUDGET_US микросекунд на запрос, включая SQL-хуки для
+EXPECTED_QUERIES_PER_REQUEST запросов к базе. Запуск:
+
+    python scripts/bench_metrics_overhead.py [requests]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from app.core.metrics import MetricsMiddleware, _request_db, instrument_engine
+
+OVERHEAD_BUDGET_US = 50
+# Столько запросов делает создание брони (см. check_query_counts.py)
+EXPECTED_QUERIES_PER_REQUEST = 5
+
+
+def make_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+    
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    """Среднее время запроса, мкс"""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        pass
+    
+    def scope(i):
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": f"/items/{i}", "raw_path": f"/items/{i}".encode(),
+            "root_path": "", "query_string": b"", "headers": [], "server": ("test", 80), "client": ("test", 1)
+        }
+    
+    # Прогрев: сборка middleware-стека, кеш меток
+    for i in range(1000):
+        await app(scope(i), receive, send)
+    began = time.perf_counter()
+    for i in range(requests):
+        await app(scope(i), receive, send)
+    return (time.perf_counter() - began) / requests * 1e6
+
+
+def query_cost(instrumented: bool, queries: int) -> float:
+    """Среднее время SELECT 1 на SQLite в памяти внутри HTTP-запроса, мкс"""
+    engine = create_engine("sqlite://")
+    if instrumented:
+        instrument_engine(engine, "bench")
+    # Счетчики запроса, как их выставляет MetricsMiddleware
+    token = _request_db.set([0, 0.0])
+    try:
+        with engine.connect() as conn:
+            for _ in range(1000):
+                conn.execute(text("SELECT 1"))
+            began = time.perf_counter()
+            for _ in range(queries):
+                conn.execute(text("SELECT 1"))
+            return (time.perf_counter() - began) / queries * 1e6
+    finally:
+        _request_db.reset(token)
+
+
+def main(requests: int = 20000):
+    plain = asyncio.run(drive(make_app(False), requests))
+    instrumented = asyncio.run(drive(make_app(True), requests))
+    request_overhead = instrumented - plain
+    print(f"Request: {plain:.1f} µs plain, {instrumented:.1f} µs with MetricsMiddleware (+{request_overhead:.1f} µs)")
+    
+    plain = query_cost(False, requests)
+    instrumented = query_cost(True, requests)
+    query_overhead = instrumented - plain
+    print(f"Query:   {plain:.1f} µs plain, {instrumented:.1f} µs with engine events (+{query_overhead:.1f} µs)")
+    
+    total_overhead = request_overhead + query_overhead * EXPECTED_QUERIES_PER_REQUEST
+    print(f"Total:   +{total_overhead:.1f} µs per request with {EXPECTED_QUERIES_PER_REQUEST} SQL statements")
+    
+    assert total_overhead < OVERHEAD_BUDGET_US, f"Metrics overhead {total_overhead:.1f} µs exceeds budget"
+    print(f"✅ Накладные расходы метрик в пределах {OVERHEAD_BUDGET_US} мкс на запрос")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
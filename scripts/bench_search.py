@@ -0,0 +1,65 @@
+"""Бенчмарк GET /availability/search: 1000 ресурсов × 10000 броней.
+
+Сравнивает BookingService.search_free_slots (один запрос + расчет промежутков)
+с прежним способом клиента — перебором ресурсов и часовых слотов через
+check_availability. Запуск:
+
+    python scripts/bench_search.py [resources] [bookings]
+"""
+import asyncio
+import sys
+import time
+from datetime import timedelta
+
+from bench_common import EPOCH, bench_database, percentiles, populate
+
+from app.services.booking import BookingService
+
+RUNS = 50
+SLOTS = 10
+DURATION = timedelta(hours=1)
+
+
+async def search(service, window_start, window_end):
+    return await service.search_free_slots(window_start, window_end, DURATION, limit=SLOTS)
+
+
+async def probe(service, window_start, window_end, resources):
+    """Перебор ресурсов и кандидатов по одному запросу на пару (ресурс, время)"""
+    found = []
+    candidate = window_start
+    while candidate + DURATION <= window_end and len(found) < SLOTS:
+        for resource_id in range(1, resources + 1):
+            if await service.check_availability(resource_id, candidate, candidate + DURATION, capacity=1):
+                found.append((resource_id, candidate))
+                if len(found) == SLOTS:
+                    break
+        candidate += DURATION
+    return found
+
+
+async def main(resources: int, bookings: int):
+    window_start = EPOCH
+    window_end = EPOCH + timedelta(days=1)
+    async with bench_database() as (engine, session_factory):
+        await populate(engine, bookings, resources)
+        async with session_factory() as db:
+            service = BookingService(db)
+            print(f"{resources} resources × {bookings} bookings, first {SLOTS} free 1h slots in 24h")
+            print(f"{'method':>10} {'p50, ms':>10} {'p99, ms':>10}")
+            for name, run in (
+                ("search", lambda: search(service, window_start, window_end)),
+                ("probing", lambda: probe(service, window_start, window_end, resources)),
+            ):
+                timings = []
+                for _ in range(RUNS):
+                    began = time.perf_counter()
+                    await run()
+                    timings.append((time.perf_counter() - began) * 1000)
+                p50, p99 = percentiles(timings)
+                print(f"{name:>10} {p50:>10.3f} {p99:>10.3f}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args or [1000, 10_000])))
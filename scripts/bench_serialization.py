@@ -0,0 +1,101 @@
+"""Микробенчмарк сериализации ответов на 10k броней: стандартный путь
+(валидация Pydantic + json.dumps) против быстрого (booking_to_dict + orjson),
+и календарь из кеша: json.loads/json.dumps против готовых байтов.
+
+База не нужна, брони генерируются в памяти. Запуск:
+
+    python scripts/bench_serialization.py [bookings] [repeats]
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.serialization import dumps, loads
+from app.schemas import booking as schemas
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_bookings(count: int):
+    users = [
+        SimpleNamespace(id=i, email=f"user{i}@example.com", username=f"user{i}", is_active=True, created_at=EPOCH)
+        for i in range(100)
+    ]
+    resources = [
+        SimpleNamespace(id=i, name=f"Room {i}", description="Meeting room", capacity=4, is_active=True, created_at=EPOCH)
+        for i in range(50)
+    ]
+    bookings = []
+    for i in range(count):
+        start_time = EPOCH + timedelta(minutes=30 * i)
+        bookings.append(SimpleNamespace(
+            id=i,
+            user_id=i % 100,
+            resource_id=i % 50,
+            start_time=start_time,
+            end_time=start_time + timedelta(hours=1),
+            notes=None,
+            status="confirmed",
+            created_at=EPOCH,
+            updated_at=None,
+            user=users[i % 100],
+            resource=resources[i % 50]
+        ))
+    return bookings
+
+
+def stdlib_list(bookings) -> bytes:
+    # То же, что делает FastAPI с response_model=BookingList и JSONResponse
+    model = schemas.BookingList.model_validate({"bookings": bookings, "next_cursor": None}, from_attributes=True)
+    return json.dumps(model.model_dump(mode="json"), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def fast_list(bookings) -> bytes:
+    return dumps({"bookings": [schemas.booking_to_dict(booking) for booking in bookings], "next_cursor": None})
+
+
+def best_of(fn, repeats: int) -> float:
+    """Лучшее время вызова, мс"""
+    timings = []
+    for _ in range(repeats):
+        began = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - began) * 1000)
+    return min(timings)
+
+
+def main(count: int = 10_000, repeats: int = 10):
+    bookings = make_bookings(count)
+    assert json.loads(stdlib_list(bookings)) == loads(fast_list(bookings)), "Fast path output differs"
+    
+    stdlib_ms = best_of(lambda: stdlib_list(bookings), repeats)
+    fast_ms = best_of(lambda: fast_list(bookings), repeats)
+    print(f"List of {count} bookings:  Pydantic + json {stdlib_ms:8.1f} ms | dict + orjson {fast_ms:8.1f} ms "
+          f"({stdlib_ms / fast_ms:.1f}x)")
+    
+    # Календарь: раньше кешированные данные разбирались и сериализовались заново
+    calendar = {
+        "resource_id": 1,
+        "period": {"start": EPOCH.isoformat(), "end": (EPOCH + timedelta(days=30)).isoformat()},
+        "bookings": [
+            {"id": b.id, "start_time": b.start_time.isoformat(), "end_time": b.end_time.isoformat(),
+             "status": b.status, "user_id": b.user_id}
+            for b in bookings
+        ]
+    }
+    cached_text = json.dumps(calendar)
+    cached_bytes = dumps(calendar)
+    stdlib_ms = best_of(lambda: json.dumps(json.loads(cached_text)).encode(), repeats)
+    raw_ms = best_of(lambda: bytes(cached_bytes), repeats)
+    miss_ms = best_of(lambda: dumps(calendar), repeats)
+    print(f"Calendar of {count} bookings: loads + dumps {stdlib_ms:8.1f} ms | cached bytes {raw_ms:8.3f} ms | "
+          f"orjson on miss {miss_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
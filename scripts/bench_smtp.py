@@ -0,0 +1,119 @@
+"""Бенчмарк доставки почты: новое SMTP-соединение на письмо против пула
+Mailer с отправкой пачкой по одной сессии.
+
+Поднимает локальный SMTP-сервер aiosmtpd (с искусственной задержкой ответа
+на каждую команду, имитирующей сетевой RTT) и проверяет, что временные
+отказы 4xx повторяются и письма доходят. Запуск:
+
+    python scripts/bench_smtp.py [messages] [rtt_ms]
+"""
+import asyncio
+import os
+import smtplib
+import sys
+import time
+from email.mime.text import MIMEText
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SMTP_PORT = int(os.getenv("BENCH_SMTP_PORT", "8025"))
+
+# Настройки Mailer читаются при импорте app, поэтому задаются заранее
+os.environ.update({
+    "SMTP_HOST": "127.0.0.1",
+    "SMTP_PORT": str(SMTP_PORT),
+    "SMTP_USER": "bench@example.com",
+    "SMTP_PASSWORD": "",
+    "SMTP_USE_TLS": "false",
+    "SMTP_DOMAIN_RATE": "0",
+    "SMTP_RETRY_BACKOFF": "0.05",
+})
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import SMTP
+
+from app.services.mailer import Mailer
+
+
+class SlowSMTP(SMTP):
+    """SMTP-сервер, отвечающий на каждую команду с задержкой rtt"""
+    
+    rtt = 0.0
+    
+    async def push(self, status):
+        await asyncio.sleep(self.rtt)
+        await super().push(status)
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+        # Сколько писем отклонить временной ошибкой 451
+        self.reject_next = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.reject_next:
+            self.reject_next -= 1
+            return "451 Try again later"
+        self.received += 1
+        return "250 OK"
+
+
+class SlowController(Controller):
+    def factory(self):
+        return SlowSMTP(self.handler)
+
+
+def make_messages(count: int):
+    messages = []
+    for i in range(count):
+        message = MIMEText(f"Message {i}")
+        message["From"] = "bench@example.com"
+        message["To"] = f"user{i}@domain{i % 5}.example.com"
+        message["Subject"] = f"Bench {i}"
+        messages.append(message)
+    return messages
+
+
+def send_one_connection_per_message(messages):
+    for message in messages:
+        server = smtplib.SMTP("127.0.0.1", SMTP_PORT)
+        server.send_message(message)
+        server.quit()
+
+
+def main(count: int = 200, rtt_ms: float = 2.0):
+    SlowSMTP.rtt = rtt_ms / 1000
+    handler = CountingHandler()
+    controller = SlowController(handler, hostname="127.0.0.1", port=SMTP_PORT)
+    controller.start()
+    try:
+        messages = make_messages(count)
+        
+        began = time.perf_counter()
+        send_one_connection_per_message(messages)
+        baseline = time.perf_counter() - began
+        print(f"Connection per message: {count / baseline:.0f} messages/s")
+        
+        mailer = Mailer()
+        began = time.perf_counter()
+        sent, failed = mailer.send_batch(messages)
+        pooled = time.perf_counter() - began
+        print(f"Pooled batch:           {count / pooled:.0f} messages/s ({baseline / pooled:.1f}x)")
+        assert sent == count and not failed, f"sent {sent}, failed {failed[:3]}"
+        
+        # Временные отказы повторяются с задержкой
+        handler.reject_next = 3
+        received = handler.received
+        sent, failed = mailer.send_batch(make_messages(10))
+        assert sent == 10 and not failed, f"sent {sent}, failed {failed}"
+        assert handler.received - received == 10
+        print("✅ Временные отказы 4xx повторены, все письма доставлены")
+        mailer.close()
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    args = [float(arg) for arg in sys.argv[1:]]
+    main(int(args[0]) if args else 200, *args[1:])
@@ -0,0 +1,59 @@
+"""Регрессионная проверка числа SQL-запросов в чтении и создании броней.
+
+Сериализует ответы через BookingResponse (как это делает FastAPI) и падает
+с ненулевым кодом, если какой-то путь выполняет больше запросов, чем задано
+в checks, — например, если снова появились ленивые загрузки user/resource
+(N+1) или лишние выборки при создании брони.
+
+    python scripts/check_query_counts.py
+"""
+import asyncio
+import sys
+from datetime import timedelta
+
+from bench_common import EPOCH, QueryCounter, bench_database, populate
+
+from app.schemas.booking import BookingCreate, BookingResponse
+from app.services.booking import BookingService
+
+MAX_READ_QUERIES = 1
+# Блокировка ресурса, проверка занятости, INSERT брони, INSERT outbox, чтение с JOIN
+MAX_CREATE_QUERIES = 5
+
+
+async def main():
+    failures = []
+    async with bench_database() as (engine, session_factory):
+        await populate(engine, 1000, 10)
+        counter = QueryCounter(engine)
+        
+        # Слот далеко за последней сгенерированной бронью, чтобы он был свободен
+        new_booking = BookingCreate(
+            resource_id=1,
+            start_time=EPOCH + timedelta(days=3650),
+            end_time=EPOCH + timedelta(days=3650, hours=1)
+        )
+        checks = {
+            "GET /bookings/": (lambda service: service.list_bookings(user_id=1, limit=100), MAX_READ_QUERIES),
+            "GET /admin/bookings/": (lambda service: service.list_bookings(limit=100), MAX_READ_QUERIES),
+            "GET /bookings/{id}": (lambda service: service.get_booking(1, user_id=1), MAX_READ_QUERIES),
+            "POST /bookings/": (lambda service: service.create_booking(1, new_booking), MAX_CREATE_QUERIES),
+        }
+        for name, (call, max_queries) in checks.items():
+            async with session_factory() as db:
+                before = counter.count
+                result = await call(BookingService(db))
+                rows = result[0] if isinstance(result, tuple) else [result]
+                [BookingResponse.model_validate(row) for row in rows]
+                queries = counter.count - before
+            status = "ok" if queries <= max_queries else "FAIL"
+            print(f"{status:>4} {name}: {len(rows)} rows, {queries} queries (max {max_queries})")
+            if queries > max_queries:
+                failures.append(name)
+    
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,49 @@
+"""Проверка redis_pool_status для синхронного и асинхронного BlockingConnectionPool.
+
+Берет соединение из пула и проверяет, что оно учтено как занятое, а после
+возврата — как свободное. Нужен Redis из REDIS_URL. Запуск:
+
+    python scripts/check_redis_pool_status.py
+"""
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import redis as sync_redis
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.core.redis_client import redis_pool_status
+
+
+def check(name: str, status: dict, expected_in_use: int):
+    assert status["in_use"] == expected_in_use, f"{name}: in_use {status['in_use']}, expected {expected_in_use}"
+    print(f"  ok {name}: {status}")
+
+
+def check_sync():
+    client = sync_redis.Redis(connection_pool=sync_redis.BlockingConnectionPool.from_url(settings.redis_url, max_connections=1))
+    connection = client.connection_pool.get_connection("PING")
+    check("sync, checked out", redis_pool_status(client), 1)
+    assert redis_pool_status(client)["saturated"], "sync: pool of one connection must be saturated"
+    client.connection_pool.release(connection)
+    check("sync, released", redis_pool_status(client), 0)
+    client.connection_pool.disconnect()
+
+
+async def check_async():
+    client = redis.Redis(connection_pool=redis.BlockingConnectionPool.from_url(settings.redis_url, max_connections=1))
+    connection = await client.connection_pool.get_connection("PING")
+    check("async, checked out", redis_pool_status(client), 1)
+    assert redis_pool_status(client)["saturated"], "async: pool of one connection must be saturated"
+    await client.connection_pool.release(connection)
+    check("async, released", redis_pool_status(client), 0)
+    await client.connection_pool.disconnect()
+
+
+if __name__ == "__main__":
+    check_sync()
+    asyncio.run(check_async())
+    print("✅ redis_pool_status учитывает занятые соединения")
@@ -0,0 +1,47 @@
+"""Нагрузочный тест промахов кеша календаря: 500 одновременных запросов.
+
+Перед каждым всплеском поколение кеша ресурса сбрасывается, так что все
+запросы промахиваются одновременно. Запросы идут тем же путем, что и
+GET /calendar/{id}: готовый JSON диапазона поверх корзин дней. Благодаря
+объединению промахов число запросов к базе на всплеск должно оставаться
+постоянным (1), а не расти с числом клиентов. Запуск:
+
+    python scripts/load_calendar_stampede.py [concurrency] [bursts]
+"""
+import asyncio
+import sys
+import time
+from datetime import timedelta
+
+from bench_common import EPOCH, QueryCounter, bench_database, populate
+
+from app.services.booking import BookingService
+from app.services.calendar_cache import invalidate_calendar, calendar_stats
+
+RESOURCE_ID = 1
+
+
+async def main(concurrency: int, bursts: int):
+    async with bench_database() as (engine, session_factory):
+        await populate(engine, 10_000, 100)
+        counter = QueryCounter(engine)
+        
+        async def request():
+            async with session_factory() as db:
+                return await BookingService(db).get_calendar_json(RESOURCE_ID, EPOCH, EPOCH + timedelta(days=7))
+        
+        print(f"{'burst':>6} {'requests':>9} {'db queries':>11} {'elapsed, ms':>12}")
+        for burst in range(1, bursts + 1):
+            await invalidate_calendar(RESOURCE_ID)
+            before = counter.count
+            began = time.perf_counter()
+            results = await asyncio.gather(*(request() for _ in range(concurrency)))
+            elapsed = (time.perf_counter() - began) * 1000
+            assert all(result == results[0] for result in results)
+            print(f"{burst:>6} {concurrency:>9} {counter.count - before:>11} {elapsed:>12.1f}")
+        print(f"calendar cache: {calendar_stats.snapshot()}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [500, 5][len(args):])))
@@ -22,10 +22,8 @@ docker-compose up -d
 echo "⏳ Waiting for services to start..."
 sleep 30
 
-# Инициализируем миграции
-echo "🗄️ Initializing database migrations..."
-docker-compose exec app alembic init alembic
-docker-compose exec app alembic revision --autogenerate -m "Initial migration"
+# Применяем миграции
+echo "🗄️ Applying database migrations..."
 docker-compose exec app alembic upgrade head
 
 echo "✅ Setup complete!"
@@ -0,0 +1,63 @@
+"""Стресс-тест: N параллельных POST /bookings/ на один и тот же слот.
+
+Ровно один запрос должен получить 200, остальные — 409. Запуск против
+работающего приложения:
+
+    python scripts/stress_double_booking.py [N]
+"""
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def stress_double_booking(parallel: int = 50):
+    suffix = uuid.uuid4().hex[:8]
+    user_data = {
+        "email": f"stress_{suffix}@example.com",
+        "username": f"stress_{suffix}",
+        "password": "stresspass123"
+    }
+    response = requests.post(f"{BASE_URL}/auth/register", json=user_data)
+    response.raise_for_status()
+    
+    response = requests.post(f"{BASE_URL}/auth/token", data={
+        "username": user_data["username"],
+        "password": user_data["password"]
+    })
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    response = requests.post(f"{BASE_URL}/resources/", json={"name": f"Stress room {suffix}"}, headers=headers)
+    response.raise_for_status()
+    resource_id = response.json()["id"]
+    
+    start_time = datetime.now() + timedelta(days=1)
+    booking_data = {
+        "resource_id": resource_id,
+        "start_time": start_time.isoformat(),
+        "end_time": (start_time + timedelta(hours=1)).isoformat()
+    }
+    
+    def book(_):
+        return requests.post(f"{BASE_URL}/bookings/", json=booking_data, headers=headers).status_code
+    
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        codes = list(pool.map(book, range(parallel)))
+    
+    succeeded = codes.count(200)
+    conflicts = codes.count(409)
+    print(f"{parallel} requests: {succeeded} succeeded, {conflicts} got 409, other: "
+          f"{sorted(set(c for c in codes if c not in (200, 409)))}")
+    
+    assert succeeded == 1, f"Expected exactly one booking, got {succeeded}"
+    assert conflicts == parallel - 1, f"Expected {parallel - 1} conflicts, got {conflicts}"
+    print("✅ Двойное бронирование не воспроизводится")
+
+
+if __name__ == "__main__":
+    stress_double_booking(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
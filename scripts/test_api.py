@@ -82,7 +82,7 @@ def test_booking_system():
     print("\n6. Получение списка бронирований...")
     response = requests.get(f"{BASE_URL}/bookings/", headers=headers)
     if response.status_code == 200:
-        bookings = response.json()
+        bookings = response.json()["bookings"]
         print(f"✅ Найдено бронирований: {len(bookings)}")
     else:
         print(f"❌ Ошибка получения бронирований: {response.text}")